@@ -1,13 +1,491 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
 import requests
+from requests.adapters import HTTPAdapter
 import streamlit as st
 
+import metrics
+from database import fetch_cached_predictions, store_cached_predictions
+from prediction_cache import PredictionCache, make_cache_key
+from resilience import AdaptiveLimiter, CircuitBreaker, LatencyTracker, backoff_delay
+
 # IMPORTANT: Replace this placeholder with the actual URL from your Railway deployment.
 API_URL = "https://npn-cognizant-hackathon.onrender.com/predict"
 API_URL_2 = "https://hotel-review-analyzer.onrender.com/analyze"
 
+
+def _model_setting(key, env_var, default):
+    """Reads a [model] setting from the environment first, then from Streamlit secrets."""
+    value = os.environ.get(env_var)
+    if value:
+        return value
+    try:
+        return st.secrets["model"][key]
+    except (KeyError, FileNotFoundError):
+        return default
+
+
+# Prediction backend: "remote" calls API_URL; "local" runs a joblib model in-process.
+# Set with SENTIMENT_BACKEND / LOCAL_MODEL_PATH, or backend / local_model_path under [model] in secrets.
+PREDICTION_BACKEND = _model_setting("backend", "SENTIMENT_BACKEND", "remote")
+LOCAL_MODEL_PATH = _model_setting("local_model_path", "LOCAL_MODEL_PATH", "model.joblib")
+LOCAL_BATCH_ROWS = 10_000  # reviews per vectorized predict_proba call
+
+REQUEST_TIMEOUT = 30  # seconds
+DEFAULT_MAX_CONCURRENCY = 8
+HTTP_POOL_SIZE = 32  # keep-alive connections held open to the API host
+
+# Bump MODEL_VERSION when the deployed model changes so cached predictions are not reused.
+MODEL_VERSION = "remote-v1"
+CACHE_MAX_ENTRIES = 50_000  # in-process LRU tier
+CACHE_USE_DATABASE = True  # Postgres tier (prediction_cache table)
+
+# Multi-review requests: {"texts": [...]} -> {"predictions": [...]}
+BATCH_CHUNK_SIZE = 32
+BATCH_MAX_PAYLOAD_BYTES = 256 * 1024
+BATCH_REPROBE_AFTER = 300.0  # seconds before batches are tried again after the server rejected one
+# Status codes meaning "this endpoint does not accept the batch payload".
+_BATCH_REJECTED_STATUSES = {400, 404, 405, 413, 415, 422}
+
+# Tail-latency controls for API calls.
+RETRY_ATTEMPTS = 3  # tries per request, including the first
+RETRY_MAX_DELAY = 5.0  # seconds; also caps a server's Retry-After
+_RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+HEDGE_ENABLED = True
+HEDGE_QUANTILE = 0.95  # a duplicate request is sent once the first has run longer than this latency quantile
+HEDGE_MIN_SAMPLES = 20  # latencies needed before hedging starts
+HEDGE_MAX_SHARE = 0.1  # at most this fraction of requests get a duplicate
+ADAPTIVE_CONCURRENCY = True  # AIMD limit on requests in flight, shared by all threads
+ADAPTIVE_MAX_CONCURRENCY = HTTP_POOL_SIZE
+BREAKER_FAILURE_THRESHOLD = 5  # consecutive failed attempts before calls fail fast
+BREAKER_RESET_TIMEOUT = 15.0  # seconds before a trial request is let through
+
+_session = None
+_session_lock = threading.Lock()
+_limiter = AdaptiveLimiter(initial=DEFAULT_MAX_CONCURRENCY, max_limit=ADAPTIVE_MAX_CONCURRENCY)
+_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+_latency = {"single": LatencyTracker(), "batch": LatencyTracker()}
+_hedge_executor = ThreadPoolExecutor(max_workers=2 * HTTP_POOL_SIZE, thread_name_prefix="api-hedge")
+_call_stats = Counter()
+_call_stats_lock = threading.Lock()
+# time.monotonic() when the server last rejected the batch shape, or None.
+_batch_rejected_at = None
+_memory_cache = PredictionCache(max_entries=CACHE_MAX_ENTRIES)
+_local_model = None
+_local_model_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling the API while its circuit breaker is open."""
+
+
+class _BatchRejected(Exception):
+    """Raised when the API does not understand a multi-review payload."""
+
+
+class LocalModel:
+    """
+    A scikit-learn sentiment model loaded from a joblib file. The file holds
+    either a fitted Pipeline that accepts raw text, or a (vectorizer, classifier)
+    pair as a tuple or a {'vectorizer', 'classifier'} dict. The classifier's
+    classes must be 0 (not happy) and 1 (happy), like the remote API.
+    """
+
+    def __init__(self, path):
+        import joblib
+
+        with open(path, "rb") as f:
+            # The file hash tags cached predictions, so replacing the model invalidates them.
+            self.version = "local-" + hashlib.sha256(f.read()).hexdigest()[:12]
+        obj = joblib.load(path)
+        if isinstance(obj, dict):
+            self.vectorizer, self.classifier = obj["vectorizer"], obj["classifier"]
+        elif isinstance(obj, (tuple, list)):
+            self.vectorizer, self.classifier = obj
+        else:
+            self.vectorizer, self.classifier = None, obj
+        self.path = path
+        self._happy_index = list(self.classifier.classes_).index(1)
+        self._not_happy_index = list(self.classifier.classes_).index(0)
+
+    def predict(self, texts):
+        """Scores a list of reviews in one vectorized call, returning {'label', 'confidence'} dictionaries."""
+        with metrics.timed("model.local_predict") as stage:
+            features = self.vectorizer.transform(texts) if self.vectorizer is not None else texts
+            probabilities = self.classifier.predict_proba(features)
+            stage.rows = len(texts)
+        happy = probabilities[:, self._happy_index]
+        not_happy = probabilities[:, self._not_happy_index]
+        # Map through the same parsing as API responses so both backends agree.
+        return [
+            _parse_prediction({"predicted_label": int(h >= n), "probabilities": [float(n), float(h)]})
+            for n, h in zip(not_happy, happy)
+        ]
+
+
+def _use_local_backend():
+    return PREDICTION_BACKEND == "local"
+
+
+def get_local_model():
+    """Returns the in-process model, loading it from LOCAL_MODEL_PATH once per process."""
+    global _local_model
+    if _local_model is None or _local_model.path != LOCAL_MODEL_PATH:
+        with _local_model_lock:
+            if _local_model is None or _local_model.path != LOCAL_MODEL_PATH:
+                _local_model = LocalModel(LOCAL_MODEL_PATH)
+    return _local_model
+
+
+def _current_model_version():
+    """Tag used in cache keys, so each backend/model has its own cached predictions."""
+    if _use_local_backend():
+        try:
+            return get_local_model().version
+        except Exception:
+            return "local-unavailable"
+    return MODEL_VERSION
+
+
+def _get_session():
+    """Returns the process-wide requests.Session so API connections are kept alive and reused."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _count(name, n=1):
+    with _call_stats_lock:
+        _call_stats[name] += n
+    metrics.increment(f"api_{name}", n)
+
+
+def _count_cache_lookups(tier, hits, misses):
+    metrics.increment("prediction_cache_lookups", hits, tier=tier, result="hit")
+    metrics.increment("prediction_cache_lookups", misses, tier=tier, result="miss")
+
+
+def _timed_post(payload, kind):
+    """Sends one HTTP request, recording it as the api.<kind>_request stage. Returns (response, seconds)."""
+    stage = f"api.{kind}_request"
+    start = time.perf_counter()
+    try:
+        response = _get_session().post(API_URL, json=payload, timeout=REQUEST_TIMEOUT)
+    except requests.exceptions.RequestException:
+        metrics.observe(stage, time.perf_counter() - start, error=True)
+        metrics.increment("api_responses", status="connection_error")
+        raise
+    seconds = time.perf_counter() - start
+    metrics.observe(stage, seconds, rows=len(payload.get("texts", [None])), error=not response.ok)
+    metrics.increment("api_responses", status=response.status_code)
+    return response, seconds
+
+
+def _hedged_post(payload, kind, release_slot=None):
+    """
+    Sends payload, and if no response has arrived by the recent p95 latency
+    for this kind of request, sends a duplicate and returns whichever good
+    response comes first. Predictions have no side effects, so duplicates
+    are safe. Returns a (response, seconds) tuple.
+
+    release_slot, if given, is called once the first request has finished.
+    When the duplicate wins, that is after this function has returned, so
+    the concurrency slot stays taken while the first request is in flight.
+    """
+    hedge_after = _latency[kind].quantile(HEDGE_QUANTILE, HEDGE_MIN_SAMPLES) if HEDGE_ENABLED else None
+    if hedge_after is None:
+        try:
+            return _timed_post(payload, kind)
+        finally:
+            if release_slot:
+                release_slot()
+
+    primary = _hedge_executor.submit(_timed_post, payload, kind)
+    if release_slot:
+        primary.add_done_callback(lambda _: release_slot())
+    if wait([primary], timeout=hedge_after).done:
+        return primary.result()
+    with _call_stats_lock:
+        within_budget = _call_stats["hedges"] < HEDGE_MAX_SHARE * _call_stats["requests"]
+    if not within_budget or (ADAPTIVE_CONCURRENCY and not _limiter.try_acquire()):
+        return primary.result()
+
+    _count("hedges")
+    hedge = _hedge_executor.submit(_timed_post, payload, kind)
+    if ADAPTIVE_CONCURRENCY:
+        hedge.add_done_callback(lambda _: _limiter.release())
+    pending, fallback, first_error = {primary, hedge}, None, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response, seconds = future.result()
+            except requests.exceptions.RequestException as e:
+                first_error = first_error or e
+                continue
+            if response.status_code in _RETRYABLE_STATUSES:
+                fallback = (response, seconds)
+                continue
+            if future is hedge:
+                _count("hedge_wins")
+            return response, seconds
+    if fallback:
+        return fallback
+    raise first_error
+
+
+def _retry_delay(attempt, response=None):
+    """Seconds to wait before the next attempt: the server's Retry-After if given, else jittered backoff."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.strip().isdigit():
+        return min(float(retry_after), RETRY_MAX_DELAY)
+    return backoff_delay(attempt, cap=RETRY_MAX_DELAY)
+
+
+def _post(payload, kind):
+    """
+    POSTs a payload to the model API with the tail-latency controls: the
+    circuit breaker, the adaptive concurrency limit, hedging after the p95
+    latency and jittered retries on 429 / 5xx / connection errors.
+
+    Returns the final response, which may still carry a non-retryable error
+    status for the caller to interpret.
+
+    Raises CircuitOpenError while the breaker is open, and the last
+    requests.exceptions.RequestException once retries are exhausted.
+    """
+    last_error = None
+    for attempt in range(max(1, RETRY_ATTEMPTS)):
+        if not _breaker.allow():
+            _count("breaker_rejections")
+            raise CircuitOpenError(
+                f"The model API is failing; calls are paused for {_breaker.seconds_until_retry():.0f}s. "
+                f"Last error: {last_error or 'repeated failures'}"
+            )
+        if attempt:
+            _count("retries")
+        _count("requests")
+        release_slot = None
+        if ADAPTIVE_CONCURRENCY:
+            _limiter.acquire()
+            release_slot = _limiter.release
+        try:
+            response, seconds = _hedged_post(payload, kind, release_slot)
+        except requests.exceptions.RequestException as e:
+            _breaker.record_failure()
+            if ADAPTIVE_CONCURRENCY:
+                _limiter.on_overload()
+            last_error = e
+            if attempt + 1 < max(1, RETRY_ATTEMPTS):
+                time.sleep(_retry_delay(attempt))
+            continue
+
+        if response.status_code in _RETRYABLE_STATUSES:
+            _count("overloads")
+            if ADAPTIVE_CONCURRENCY:
+                _limiter.on_overload()
+            # 429 means the API is up but busy, so it does not count towards opening the circuit.
+            if response.status_code == 429:
+                _breaker.record_success()
+            else:
+                _breaker.record_failure()
+            last_error = requests.exceptions.HTTPError(f"HTTP {response.status_code} from the model API", response=response)
+            if attempt + 1 < max(1, RETRY_ATTEMPTS):
+                time.sleep(_retry_delay(attempt, response))
+            continue
+
+        _breaker.record_success()
+        if ADAPTIVE_CONCURRENCY:
+            _limiter.on_success()
+        if response.ok:
+            _latency[kind].record(seconds)
+        return response
+    raise last_error
+
+
+def reset_api_controls():
+    """
+    Rebuilds the concurrency limit, circuit breaker, latency windows and
+    counters from the settings above, and forgets any batch rejection.
+    """
+    global _limiter, _breaker, _latency, _batch_rejected_at
+    _limiter = AdaptiveLimiter(initial=DEFAULT_MAX_CONCURRENCY, max_limit=ADAPTIVE_MAX_CONCURRENCY)
+    _breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+    _latency = {"single": LatencyTracker(), "batch": LatencyTracker()}
+    _batch_rejected_at = None
+    with _call_stats_lock:
+        _call_stats.clear()
+
+
+def get_api_stats():
+    """Returns counters and current state of the API tail-latency controls."""
+    with _call_stats_lock:
+        stats = dict(_call_stats)
+    stats.update(
+        concurrency_limit=_limiter.limit,
+        in_flight=_limiter.in_flight,
+        breaker_state=_breaker.state,
+        p50_ms={kind: 1000 * (tracker.quantile(0.5) or 0) for kind, tracker in _latency.items()},
+        p95_ms={kind: 1000 * (tracker.quantile(0.95) or 0) for kind, tracker in _latency.items()},
+    )
+    return stats
+
+
+def _parse_prediction(api_response):
+    """
+    Maps the API's 'predicted_label'/'probabilities' response onto the
+    {'label', 'confidence'} dictionary the Streamlit app expects.
+
+    Returns None if the response is not in the expected format.
+    """
+    if not isinstance(api_response, dict):
+        return None
+
+    predicted_label = api_response.get("predicted_label")
+    probabilities = api_response.get("probabilities")
+
+    # Check if the expected keys are in the response
+    if predicted_label is not None and probabilities and len(probabilities) == 2:
+        if predicted_label == 1:
+            label = "Happy"
+            confidence = probabilities[1]  # The probability of the 'happy' class
+        else:
+            label = "Not Happy"
+            confidence = probabilities[0]  # The probability of the 'not happy' class
+        return {"label": label, "confidence": confidence}
+    return None
+
+
+def _request_prediction(review_text: str):
+    """
+    Sends one review to the model API over the shared session.
+
+    Raises requests.exceptions.RequestException on connection/HTTP errors and
+    ValueError when the response is not in the expected format.
+    """
+    # The payload should match what your API endpoint expects.
+    payload = {"text": review_text}
+
+    response = _post(payload, "single")
+
+    # Raise an exception for bad status codes (4xx or 5xx)
+    response.raise_for_status()
+
+    api_response = response.json()
+    result = _parse_prediction(api_response)
+    if result is None:
+        raise ValueError(f"The response from the model was not in the expected format. Received: {api_response}")
+    return result
+
+
+def _request_prediction_chunk(texts):
+    """
+    Sends several reviews to the model API in one request.
+
+    Returns:
+        A list with one entry per text: a {'label', 'confidence'} dictionary,
+        or a ValueError describing why that single item could not be scored.
+
+    Raises _BatchRejected if the server does not accept the batch shape, and
+    requests.exceptions.RequestException on connection/HTTP errors.
+    """
+    global _batch_rejected_at
+
+    response = _post({"texts": texts}, "batch")
+    if response.status_code in _BATCH_REJECTED_STATUSES:
+        # 413 only means this chunk was too big, not that batching is unsupported.
+        if response.status_code != 413:
+            _batch_rejected_at = time.monotonic()
+        raise _BatchRejected(f"HTTP {response.status_code}")
+    response.raise_for_status()
+
+    try:
+        api_response = response.json()
+    except ValueError:
+        # A garbled body (say, a proxy's error page) says nothing about the batch
+        # shape, so only this chunk falls back to single requests.
+        raise _BatchRejected("non-JSON response")
+    items = api_response.get("predictions") if isinstance(api_response, dict) else api_response
+    if not isinstance(items, list) or len(items) != len(texts):
+        _batch_rejected_at = time.monotonic()
+        raise _BatchRejected(f"unexpected response shape: {str(api_response)[:200]}")
+
+    _batch_rejected_at = None
+    results = []
+    for item in items:
+        result = _parse_prediction(item)
+        if result is None:
+            detail = item.get("error", item) if isinstance(item, dict) else item
+            result = ValueError(f"The model could not score this review. Received: {detail}")
+        results.append(result)
+    return results
+
+
+def _batching_enabled():
+    """False for BATCH_REPROBE_AFTER seconds after the server rejected a batch, so a redeployed API gets asked again."""
+    return _batch_rejected_at is None or time.monotonic() - _batch_rejected_at >= BATCH_REPROBE_AFTER
+
+
+def _score_chunk(chunk):
+    """
+    Scores a chunk of (key, text) pairs, preferring a single multi-review
+    request and falling back to one request per review if the server rejects it.
+
+    Returns:
+        A list of (key, outcome) pairs, where outcome is a prediction
+        dictionary or the exception raised for that review.
+    """
+    keys = [key for key, _ in chunk]
+    texts = [text for _, text in chunk]
+
+    if len(chunk) > 1 and _batching_enabled():
+        try:
+            return list(zip(keys, _request_prediction_chunk(texts)))
+        except _BatchRejected:
+            pass
+        except requests.exceptions.RequestException as e:
+            return [(key, e) for key in keys]
+
+    outcomes = []
+    for key, text in chunk:
+        try:
+            outcomes.append((key, _request_prediction(text)))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            outcomes.append((key, e))
+    return outcomes
+
+
+def _make_chunks(items, chunk_size, max_payload_bytes):
+    """Groups (key, text) pairs into chunks bounded by item count and JSON payload size."""
+    chunk, chunk_bytes = [], 0
+    for i, text in items:
+        item_bytes = len(json.dumps(text).encode()) + 1  # +1 for the separating comma
+        if chunk and (len(chunk) >= chunk_size or chunk_bytes + item_bytes > max_payload_bytes):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append((i, text))
+        chunk_bytes += item_bytes
+    if chunk:
+        yield chunk
+
+
 def predict_sentiment_api(review_text: str):
     """
-    Sends a review to the deployed model API and returns the prediction.
+    Sends a review to the deployed model API (or the local model, when
+    PREDICTION_BACKEND is "local") and returns the prediction.
 
     Args:
         review_text: The string of the hotel review.
@@ -18,43 +496,178 @@ def predict_sentiment_api(review_text: str):
     if not review_text or not review_text.strip():
         return None
 
-    try:
-        # The payload should match what your API endpoint expects.
-        payload = {"text": review_text}
-        
-        # Make the POST request to your API
-        response = requests.post(API_URL, json=payload, timeout=30) # 30-second timeout
-        
-        # Raise an exception for bad status codes (4xx or 5xx)
-        response.raise_for_status()
-        
-        # Parse the JSON response from the API
-        api_response = response.json()
-        
-        # Extract data based on the new structure
-        predicted_label = api_response.get("predicted_label")
-        probabilities = api_response.get("probabilities")
-
-        # Check if the expected keys are in the response
-        if predicted_label is not None and probabilities and len(probabilities) == 2:
-            if predicted_label == 1:
-                label = "Happy"
-                confidence = probabilities[1]  # The probability of the 'happy' class
-            else:
-                label = "Not Happy"
-                confidence = probabilities[0]  # The probability of the 'not happy' class
-            
-            # Return the standardized dictionary that the Streamlit app expects
-            return {"label": label, "confidence": confidence}
-        else:
-            st.error(f"API Error: The response from the model was not in the expected format. Received: {api_response}")
+    model_version = _current_model_version()
+    key = make_cache_key(review_text, model_version)
+    cached = _memory_cache.get_many([key])
+    _count_cache_lookups("memory", len(cached), 1 - len(cached))
+    if not cached and CACHE_USE_DATABASE:
+        cached = fetch_cached_predictions([key])
+        _memory_cache.put_many(cached)
+        _count_cache_lookups("database", len(cached), 1 - len(cached))
+    if cached:
+        return cached[key]
+
+    if _use_local_backend():
+        try:
+            result = get_local_model().predict([review_text])[0]
+        except Exception as e:
+            st.error(f"Local Model Error: Could not score the review with the model at '{LOCAL_MODEL_PATH}'. Details: {e}")
             return None
+        _store_predictions({key: result}, model_version)
+        return result
 
+    try:
+        result = _request_prediction(review_text)
+        _store_predictions({key: result}, model_version)
+        return result
+    except ValueError as e:
+        st.error(f"API Error: {e}")
+        return None
     except requests.exceptions.RequestException as e:
         # Display an informative error in the Streamlit app
         st.error(f"API Connection Error: Could not connect to the model endpoint. Please ensure the API is running. Details: {e}")
         return None
 
+
+def _store_predictions(predictions, model_version):
+    """Writes fresh predictions to both cache tiers."""
+    _memory_cache.put_many(predictions)
+    if CACHE_USE_DATABASE:
+        store_cached_predictions(predictions, model_version)
+
+
+def _score_remotely(to_score, max_concurrency, chunk_size, max_payload_bytes):
+    """Yields lists of (key, outcome) pairs as concurrent API requests complete."""
+    chunks = _make_chunks(to_score, max(1, chunk_size), max_payload_bytes)
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = [executor.submit(_score_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _score_locally(to_score):
+    """Yields lists of (key, outcome) pairs, scoring LOCAL_BATCH_ROWS reviews per model call."""
+    try:
+        model = get_local_model()
+    except Exception as e:
+        yield [(key, e) for key, _ in to_score]
+        return
+    for start in range(0, len(to_score), LOCAL_BATCH_ROWS):
+        batch = to_score[start:start + LOCAL_BATCH_ROWS]
+        try:
+            yield list(zip([key for key, _ in batch], model.predict([text for _, text in batch])))
+        except Exception as e:
+            yield [(key, e) for key, _ in batch]
+
+
+def clear_memory_cache():
+    """Empties the in-process prediction cache."""
+    _memory_cache.clear()
+
+
+def predict_sentiment_batch(texts, max_concurrency=DEFAULT_MAX_CONCURRENCY, progress_callback=None,
+                            chunk_size=BATCH_CHUNK_SIZE, max_payload_bytes=BATCH_MAX_PAYLOAD_BYTES,
+                            stats=None):
+    """
+    Scores many reviews concurrently over the shared keep-alive session, or in
+    vectorized batches when PREDICTION_BACKEND is "local".
+
+    Predictions are looked up first in the in-process LRU cache, then in the
+    prediction_cache table; only reviews found in neither are sent to the API,
+    and repeated reviews within the batch are sent once.
+
+    Remaining reviews are grouped into chunks of up to `chunk_size` reviews and
+    `max_payload_bytes` of JSON, and each chunk is sent as one request. If the
+    server rejects the multi-review payload, that chunk is retried one review
+    per request. Use chunk_size=1 to always send single-review requests.
+
+    Args:
+        texts: An iterable of review strings.
+        max_concurrency: Maximum number of requests in flight at once.
+        progress_callback: Optional callable(done, total), invoked from the
+            calling thread each time a chunk finishes.
+        chunk_size: Maximum number of reviews per request.
+        max_payload_bytes: Approximate cap on the JSON size of one request.
+        stats: Optional dict that is filled with 'memory_hits', 'db_hits' and
+            'misses' for this run. Hits count rows; misses count the unique
+            reviews that had to be sent to the model.
+
+    Returns:
+        A list with one entry per input text, in input order. Each entry is a
+        {'label', 'confidence'} dictionary, or None if that review failed.
+    """
+    texts = list(texts)
+    total = len(texts)
+    results = [None] * total
+    if stats is not None:
+        stats.update(memory_hits=0, db_hits=0, misses=0)
+    if total == 0:
+        return results
+
+    # Group rows by cache key. Empty reviews are skipped, like predict_sentiment_api.
+    model_version = _current_model_version()
+    rows_by_key, text_by_key = {}, {}
+    for i, text in enumerate(texts):
+        if text and str(text).strip():
+            key = make_cache_key(text, model_version)
+            rows_by_key.setdefault(key, []).append(i)
+            text_by_key.setdefault(key, str(text))
+
+    resolved = _memory_cache.get_many(rows_by_key)
+    memory_hits = sum(len(rows_by_key[key]) for key in resolved)
+    db_hits = 0
+    missing = [key for key in rows_by_key if key not in resolved]
+    _count_cache_lookups("memory", len(resolved), len(missing))
+    if missing and CACHE_USE_DATABASE:
+        from_db = fetch_cached_predictions(missing)
+        _memory_cache.put_many(from_db)
+        _count_cache_lookups("database", len(from_db), len(missing) - len(from_db))
+        db_hits = sum(len(rows_by_key[key]) for key in from_db)
+        resolved.update(from_db)
+
+    for key, prediction in resolved.items():
+        for i in rows_by_key[key]:
+            results[i] = prediction
+
+    to_score = [(key, text_by_key[key]) for key in rows_by_key if key not in resolved]
+    if _use_local_backend():
+        outcome_batches = _score_locally(to_score)
+    else:
+        outcome_batches = _score_remotely(to_score, max_concurrency, chunk_size, max_payload_bytes)
+
+    errors, failed_rows, fresh = [], 0, {}
+    done = total - sum(len(rows_by_key[key]) for key, _ in to_score)
+    if progress_callback and done:
+        progress_callback(done, total)
+
+    for outcomes in outcome_batches:
+        for key, outcome in outcomes:
+            rows = rows_by_key[key]
+            if isinstance(outcome, Exception):
+                errors.append(outcome)
+                failed_rows += len(rows)
+            else:
+                fresh[key] = outcome
+                for i in rows:
+                    results[i] = outcome
+            done += len(rows)
+        if progress_callback:
+            progress_callback(done, total)
+
+    if fresh:
+        _store_predictions(fresh, model_version)
+
+    if stats is not None:
+        # Repeats of a freshly scored review within this batch are served from memory.
+        repeats = sum(len(rows_by_key[key]) - 1 for key in fresh)
+        stats.update(memory_hits=memory_hits + repeats, db_hits=db_hits, misses=len(to_score))
+
+    # Report failures once per batch instead of once per review.
+    if errors:
+        source = "Local Model Error" if _use_local_backend() else "API Connection Error"
+        st.error(f"{source}: {failed_rows} of {total} reviews could not be scored. First error: {errors[0]}")
+    return results
+
 # # This function for aspect analysis remains the same
 # def analyze_aspect_api(aspect_word: str):
 #     """Calls the deployed API to analyze sentiment for a specific aspect."""
@@ -64,6 +677,6 @@ def predict_sentiment_api(review_text: str):
 #         response = requests.get(API_URL_2, params=params, timeout=30)
 #         response.raise_for_status()
 #         return response.json()
-        
+
 #     except requests.exceptions.RequestException as e:
-#         return {"error": f"API call failed: {e}"}
\ No newline at end of file
+#         return {"error": f"API call failed: {e}"}
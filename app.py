@@ -1,35 +1,117 @@
+import time
+
 import streamlit as st
 import pandas as pd
 from datetime import datetime
 
 # Import from your custom modules
-from database import setup_database, insert_single_review, insert_bulk_reviews, fetch_all_reviews, get_aspect_counts
-from dashboard import create_sentiment_distribution_plot, create_time_series_plot
-from api_client import predict_sentiment_api
+from database import ensure_database_ready, insert_single_review, fetch_daily_sentiment, lookup_aspect_counts, get_pool_stats, get_ingest_checkpoint, enqueue_ingest_job, fetch_ingest_jobs, cancel_ingest_job
+from dashboard import create_sentiment_counts_plot, create_daily_trend_plot, create_time_series_plot
+from api_client import predict_sentiment_api, get_api_stats
+from ingest import file_fingerprint
+from history_cache import get_review_history
+from snapshot import load_snapshot, refresh_snapshot, snapshot_info
+import metrics
 
 # --- 1. SETUP ---
 st.set_page_config(page_title="Hotel Sentiment Analyzer", layout="wide")
-setup_database()
+rerun_start = time.perf_counter()
+# A rerun requested from the Diagnostics tab is run under cProfile. A click during that
+# rerun stops it early, so a capture it left running is discarded at the start of the next one.
+if st.session_state.get('active_profiler') is not None:
+    metrics.stop_profile(st.session_state.pop('active_profiler'))
+profile_requested = st.session_state.pop('profile_next_rerun', False)
+profiler = metrics.start_profile() if profile_requested else None
+st.session_state.active_profiler = profiler
+ensure_database_ready()
+if metrics.METRICS_PORT:
+    metrics.start_metrics_server(metrics.METRICS_PORT)
 
 # --- Initialize Session State ---
 # This will store the loaded dataframe to prevent re-fetching on every rerun.
 if 'all_reviews_df' not in st.session_state:
     st.session_state.all_reviews_df = None
+if 'ingest_job_ids' not in st.session_state:
+    st.session_state.ingest_job_ids = []
+
+# Reviews sent to the browser at a time in Review History; the whole table can be too big for one message.
+HISTORY_PAGE_ROWS = 1_000
+
+# --- Bulk upload jobs ---
+JOB_POLL_SECONDS = 2
+ACTIVE_JOB_STATUSES = ('queued', 'running')
+
+
+def show_ingest_summary(summary):
+    """Shows the outcome of a finished upload job."""
+    if summary['invalid_timestamps'] > 0:
+        st.warning(f"{summary['invalid_timestamps']} rows had a date format that could not be understood and were ignored.")
+    if summary['failed_predictions'] > 0:
+        st.warning(f"{summary['failed_predictions']} reviews could not be analyzed and were not saved.")
+
+    if summary['already_completed']:
+        st.info("Nothing to do: every row of this file was already saved.")
+    else:
+        st.success(f"All reviews have been analyzed and saved to the database! ({summary['rows_saved']} saved)")
+
+    if summary['duplicates_skipped'] > 0:
+        st.caption(f"{summary['duplicates_skipped']} reviews were already in the database and were skipped.")
+    if summary['resumed_from']:
+        st.caption(f"Resumed after row {summary['resumed_from']} of a previous upload.")
+    cache_stats = summary['cache']
+    if cache_stats:
+        st.caption(f"Prediction cache: {cache_stats.get('memory_hits', 0)} in-memory hits, {cache_stats.get('db_hits', 0)} database hits, {cache_stats.get('misses', 0)} reviews sent to the model.")
+
+    # JSON turned the label keys into strings.
+    label_counts = {int(label): count for label, count in summary['label_counts'].items()}
+    if label_counts:
+        st.plotly_chart(create_sentiment_counts_plot(label_counts), use_container_width=True)
+
+
+def show_ingest_jobs(was_polling):
+    """Shows the status of this session's upload jobs."""
+    jobs = fetch_ingest_jobs(st.session_state.ingest_job_ids) or []
+    for job in jobs:
+        with st.container(border=True):
+            st.markdown(f"**{job['file_name']}** · job {job['id']} · {job['status']}")
+            if job['status'] in ACTIVE_JOB_STATUSES:
+                total = max(job['total_rows'] or 1, 1)
+                text = f"Analyzed {job['rows_done']}/{total} rows" if job['status'] == 'running' else "Waiting for a worker..."
+                st.progress(min(job['rows_done'] / total, 1.0), text=text)
+                if job['status'] == 'queued' and job['attempts'] == 0 and job['age_s'] > 30:
+                    st.caption("No worker has picked this job up yet. Start one with `python worker.py`.")
+                if job['error']:
+                    st.caption(f"Retrying after: {job['error']}")
+                if st.button("Cancel", key=f"cancel_job_{job['id']}"):
+                    cancel_ingest_job(job['id'])
+                    st.rerun(scope="fragment")
+            elif job['status'] == 'done':
+                show_ingest_summary(job['summary'])
+            elif job['status'] == 'failed':
+                st.error(f"Processing failed: {job['error']} Upload the same file again to resume.")
+            else:
+                st.info("This job was cancelled. Upload the same file again to resume.")
+    if was_polling and not any(job['status'] in ACTIVE_JOB_STATUSES for job in jobs):
+        st.rerun()  # every job has finished; rerun the page so the polling stops
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def snapshot_trend_figure(last_id, rows, start_date, end_date):
+    """Builds the snapshot trend chart, cached per snapshot version (last_id, rows) and date range."""
+    snapshot_df = load_snapshot()
+    if start_date is not None:
+        in_range = snapshot_df['timestamp'] >= pd.Timestamp(start_date)
+        if end_date is not None:
+            in_range &= snapshot_df['timestamp'] < pd.Timestamp(end_date) + pd.Timedelta(days=1)
+        snapshot_df = snapshot_df[in_range]
+    return create_time_series_plot(snapshot_df)
 
-# --- HELPER FUNCTION FOR DATE CLEANING (remains the same) ---
-def normalize_timestamps(df, column_name='Time_Stamp'):
-    df[column_name] = pd.to_datetime(df[column_name], errors='coerce')
-    failed_parses = df[column_name].isnull().sum()
-    if failed_parses > 0:
-        st.warning(f"{failed_parses} rows had a date format that could not be understood and were ignored.")
-    df.dropna(subset=[column_name], inplace=True)
-    return df
 
 # --- 2. STREAMLIT UI ---
 st.title("🏨 Hotel Review Sentiment Analyzer")
 st.markdown("An intelligent dashboard to analyze hotel guest feedback, powered by a machine learning API.")
 
-tab1, tab2, tab3, tab4 = st.tabs(["✍️ Single Review", "📤 Bulk Upload", "📈 Overall Dashboard", "🔬 Aspect Analysis"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["✍️ Single Review", "📤 Bulk Upload", "📈 Overall Dashboard", "🔬 Aspect Analysis", "🩺 Diagnostics"])
 
 # --- TAB 1: SINGLE REVIEW ANALYSIS ---
 with tab1:
@@ -70,69 +152,119 @@ with tab2:
 
     if uploaded_file is not None:
         try:
-            df_upload = pd.read_csv(uploaded_file)
-            if 'Time_Stamp' in df_upload.columns and 'Description' in df_upload.columns:
-                st.success("CSV file loaded successfully. Normalizing date formats...")
-                df_upload = normalize_timestamps(df_upload, 'Time_Stamp')
+            # Only the header is parsed here; the rows are streamed in chunks when processing starts.
+            upload_columns = pd.read_csv(uploaded_file, nrows=0).columns
+            uploaded_file.seek(0)
+            if 'Time_Stamp' in upload_columns and 'Description' in upload_columns:
+                st.success("CSV file loaded successfully.")
+                file_key, line_count = file_fingerprint(uploaded_file)
+                checkpoint = get_ingest_checkpoint(file_key)
+                restart = False
+                if checkpoint and checkpoint['completed']:
+                    st.info("This file has already been processed and saved to the database.")
+                    restart = st.checkbox("Process it again from the first row")
+                elif checkpoint:
+                    st.info(f"A previous upload of this file stopped after {checkpoint['rows_committed']} rows. Processing will resume from there.")
+                    restart = st.checkbox("Start over from the first row instead")
 
                 if st.button("Process and Save to Database"):
-                    progress_bar = st.progress(0, text="Initializing analysis...")
-                    total_rows = len(df_upload)
-                    results = []
-
-                    for index, row in df_upload.iterrows():
-                        api_result = predict_sentiment_api(str(row['Description']))
-                        results.append(api_result if api_result else {'label': 'Error', 'confidence': 0.0})
-                        progress_value = (index + 1) / total_rows
-                        progress_bar.progress(min(progress_value, 1.0), text=f"Analyzing review {index + 1}/{total_rows}")
-
-                    progress_bar.empty()
-
-                    df_results = pd.DataFrame(results)
-                    df_upload['predicted_sentiment'] = df_results['label']
-                    df_upload['confidence'] = df_results['confidence']
-                    df_upload['predicted_label'] = df_upload['predicted_sentiment'].map({'Happy': 1, 'Not Happy': 0, 'Error': -1})
-
-                    df_to_db = df_upload[df_upload['predicted_label'] != -1][['Time_Stamp', 'Description', 'predicted_label']].copy()
-                    df_to_db.rename(columns={'Time_Stamp': 'timestamp', 'Description': 'review_text'}, inplace=True)
-                    if not df_to_db.empty:
-                        insert_bulk_reviews(df_to_db)
-
-                    st.success("All reviews have been analyzed and saved to the database!")
-                    st.divider()
-                    st.header("Dashboard for Uploaded File")
-                    st.plotly_chart(create_sentiment_distribution_plot(df_upload), use_container_width=True)
+                    # The upload is queued and processed by worker.py, so it carries on if this tab is closed.
+                    job_id = enqueue_ingest_job(file_key, uploaded_file.name, uploaded_file.getvalue(),
+                                                total_rows=max(line_count - 1, 1), restart=restart)
+                    if job_id is not None and job_id not in st.session_state.ingest_job_ids:
+                        st.session_state.ingest_job_ids.append(job_id)
 
             else:
                 st.error("Error: The CSV file must contain 'Time_Stamp' and 'Description' columns.")
         except Exception as e:
             st.error(f"An error occurred while processing the file: {e}")
 
+    if st.session_state.ingest_job_ids:
+        jobs = fetch_ingest_jobs(st.session_state.ingest_job_ids) or []
+        # Poll while any of this session's jobs is unfinished; the fragment reruns on its own, not the whole page.
+        polling = any(job['status'] in ACTIVE_JOB_STATUSES for job in jobs)
+        st.fragment(run_every=JOB_POLL_SECONDS if polling else None)(show_ingest_jobs)(polling)
+
 # --- TAB 3: OVERALL DASHBOARD ---
 with tab3:
     st.header("Overall Sentiment Trends")
     st.caption("This dashboard shows the sentiment trend over time based on all reviews stored in the database.")
 
-    if st.button("Load/Refresh Historical Data"):
-        with st.spinner("Fetching and analyzing all historical reviews..."):
-            st.session_state.all_reviews_df = fetch_all_reviews()
-    
-    st.divider()
+    # The trend is read from the daily_sentiment rollup, so it stays fast however many reviews are stored.
+    date_range = st.date_input("Date range", value=(), help="Leave empty to show the full history.")
+    start_date = date_range[0] if len(date_range) > 0 else None
+    end_date = date_range[1] if len(date_range) > 1 else None
+    daily_df = fetch_daily_sentiment(start_date, end_date)
 
-    if st.session_state.all_reviews_df is not None and not st.session_state.all_reviews_df.empty:
-        time_series_fig = create_time_series_plot(st.session_state.all_reviews_df)
+    if daily_df is not None and not daily_df.empty:
+        time_series_fig = create_daily_trend_plot(daily_df)
         if time_series_fig:
             st.plotly_chart(time_series_fig, use_container_width=True)
         else:
-            st.warning("Could not generate time-series plot. Ensure 'timestamp' column has valid dates.")
+            st.warning("Could not generate time-series plot for this period.")
+        label_totals = daily_df.groupby('predicted_label')['count'].sum().to_dict()
+        st.plotly_chart(create_sentiment_counts_plot(label_totals), use_container_width=True)
+    else:
+        st.info("No reviews in this period yet. Analyze some reviews!")
+
+    # A compact columnar copy of the reviews (no text, int8 labels), memory-mapped from local Arrow files.
+    with st.expander("Analytics snapshot"):
+        update_col, rebuild_col = st.columns(2)
+        if update_col.button("Update snapshot"):
+            with st.spinner("Exporting new reviews to the snapshot..."):
+                update = refresh_snapshot()
+            if update is not None:
+                st.success(f"Added {update['rows_added']:,} reviews to the snapshot.")
+        if rebuild_col.button("Rebuild snapshot", help="Exports every review again, dropping ones that were "
+                                                        "deleted from the database since they were exported."):
+            with st.spinner("Exporting all reviews to a new snapshot..."):
+                update = refresh_snapshot(rebuild=True)
+            if update is not None:
+                st.success(f"Rebuilt the snapshot with {update['rows']:,} reviews.")
+        # The expander body runs on every rerun, even collapsed, so the snapshot is only read when asked for.
+        if st.toggle("Show snapshot trend", key="show_snapshot_trend"):
+            info = snapshot_info()
+            if info["rows"]:
+                st.caption(f"{info['rows']:,} reviews in {info['parts']} file(s), {info['bytes'] / 2**20:.1f} MiB on disk.")
+                snapshot_fig = snapshot_trend_figure(info['last_id'], info['rows'], start_date, end_date)
+                if snapshot_fig:
+                    st.plotly_chart(snapshot_fig, use_container_width=True, key="snapshot_trend")
+                else:
+                    st.info("The snapshot has no reviews in this period.")
+            else:
+                st.info("No snapshot yet. Click 'Update snapshot' to export the reviews.")
+
+    st.divider()
+    st.subheader("Review History")
+    # The rows live in a cache shared by all sessions; a refresh only fetches reviews added since the last one.
+    refresh_col, reload_col = st.columns(2)
+    if refresh_col.button("Load/Refresh Historical Data"):
+        with st.spinner("Fetching new reviews..."):
+            st.session_state.all_reviews_df = get_review_history().refresh()
+    if reload_col.button("Reload all reviews", help="Drops the shared cache and reads every review again, "
+                                                     "e.g. after old or duplicate reviews were deleted."):
+        with st.spinner("Reading all reviews..."):
+            st.session_state.all_reviews_df = get_review_history().reload()
+
+    history_df = st.session_state.all_reviews_df
+    if history_df is not None and not history_df.empty:
+        # Like the snapshot trend, the table is only built when asked for, and one page at a time.
+        if st.toggle(f"Browse the {len(history_df):,} loaded reviews", key="show_review_history"):
+            page_count = -(-len(history_df) // HISTORY_PAGE_ROWS)
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1, key="review_history_page")
+            first = (page - 1) * HISTORY_PAGE_ROWS
+            page_df = history_df.iloc[first:first + HISTORY_PAGE_ROWS]
+            st.caption(f"Reviews {first + 1:,}-{first + len(page_df):,} of {len(history_df):,}, most recently added "
+                       f"first. Click a column header to sort this page.")
+            st.dataframe(page_df, use_container_width=True, hide_index=True)
     else:
-        st.info("Click 'Load/Refresh' or analyze some reviews!")
+        st.info("Click 'Load/Refresh' to browse the stored reviews.")
 
 
 # --- TAB 4: ASPECT ANALYSIS ---
 with tab4:
     st.header("Analyze Key Aspects from Your Database")
-    st.caption("Enter a single word (e.g., 'staff', 'bed', 'location') to see its performance score based on all reviews in your database.")
+    st.caption("Enter a single word (e.g., 'staff', 'bed', 'location') to see its performance score based on all reviews in your database. Matching is by whole word, so 'room' also counts 'rooms'.")
 
     with st.form("aspect_analysis_form"):
         aspect_word = st.text_input("Enter aspect to analyze:", key="aspect_input").lower().strip()
@@ -140,7 +272,8 @@ with tab4:
 
         if aspect_submitted and aspect_word:
             with st.spinner(f"Searching database for reviews about '{aspect_word}'..."):
-                counts = get_aspect_counts(aspect_word)
+                all_counts = lookup_aspect_counts([aspect_word])
+                counts = all_counts.get(aspect_word) if all_counts is not None else None
 
             if counts and counts["total_mentions"] > 0:
                 total_mentions = counts["total_mentions"]
@@ -173,3 +306,117 @@ with tab4:
 
         elif aspect_submitted:
             st.warning("Please enter an aspect to analyze.")
+
+    st.divider()
+    st.subheader("Compare Several Aspects")
+    with st.form("aspect_comparison_form"):
+        aspects_text = st.text_input("Enter aspects separated by commas:", value="staff, bed, location, wifi", key="aspects_input")
+        comparison_submitted = st.form_submit_button("Compare Aspects")
+
+        if comparison_submitted:
+            aspects = [a.lower().strip() for a in aspects_text.split(",") if a.strip()]
+            if aspects:
+                with st.spinner("Searching database for all aspects..."):
+                    # Single words are answered from the aspect index; phrases use one full-text query.
+                    all_counts = lookup_aspect_counts(aspects)
+
+                if all_counts is not None:
+                    comparison_df = pd.DataFrame([{"Aspect": aspect, **all_counts[aspect]} for aspect in dict.fromkeys(aspects)])
+                    comparison_df["Performance Score (%)"] = (
+                        comparison_df["happy_mentions"] / comparison_df["total_mentions"].where(comparison_df["total_mentions"] > 0) * 100
+                    ).round(2)
+                    comparison_df.rename(columns={"total_mentions": "Total Mentions", "happy_mentions": "Happy Mentions",
+                                                  "not_happy_mentions": "Not Happy Mentions"}, inplace=True)
+                    st.dataframe(comparison_df, use_container_width=True, hide_index=True)
+                else:
+                    st.error("Could not retrieve aspect analysis data at this time.")
+            else:
+                st.warning("Please enter at least one aspect to compare.")
+
+
+# --- TAB 5: DIAGNOSTICS ---
+# Everything above has run by now, so this rerun's timings (and profile, if one was requested) are included.
+metrics.observe("app.rerun", time.perf_counter() - rerun_start)
+if profiler:
+    st.session_state.active_profiler = None
+    metrics.finish_profile(profiler, f"Rerun at {datetime.now():%H:%M:%S}")
+if metrics.METRICS_FILE:
+    metrics.write_prometheus(metrics.METRICS_FILE)
+
+with tab5:
+    st.header("Diagnostics")
+    current = metrics.snapshot()
+    st.caption(f"Timings and counters for this server process, collected over the last {current['uptime_s'] / 60:.0f} minutes "
+               "(or since they were reset). All sessions share them.")
+
+    st.subheader("Stages")
+    if current["stages"]:
+        stages_df = pd.DataFrame(current["stages"]).rename(columns={
+            "stage": "Stage", "count": "Runs", "errors": "Errors", "mean_ms": "Mean (ms)", "p50_ms": "p50 (ms)",
+            "p95_ms": "p95 (ms)", "p99_ms": "p99 (ms)", "max_ms": "Max (ms)", "total_s": "Total (s)",
+            "rows": "Rows", "rows_per_sec": "Rows/sec"})
+        st.dataframe(stages_df.round(1), use_container_width=True, hide_index=True)
+    else:
+        st.info("Nothing has been timed yet.")
+
+    st.subheader("Caches")
+    cache_rows = []
+    for counter, cache in (("prediction_cache_lookups", "Prediction cache"), ("aspect_lookups", "Aspect index")):
+        for tier, (hits, lookups) in sorted(metrics.hit_rates(counter).items()):
+            cache_rows.append({"Cache": cache, "Tier": tier, "Hits": hits, "Lookups": lookups,
+                               "Hit rate (%)": round(100 * hits / lookups, 1) if lookups else None})
+    if cache_rows:
+        st.dataframe(pd.DataFrame(cache_rows), use_container_width=True, hide_index=True)
+    history_stats = get_review_history().stats()
+    st.caption(f"Review history cache: {history_stats['rows']:,} rows · {history_stats['refreshes']} refreshes "
+               f"({history_stats['throttled_refreshes']} served without a query) · {history_stats['pages_fetched']} pages fetched.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Model API")
+        api_stats = get_api_stats()
+        st.metric("Requests in flight", f"{api_stats['in_flight']}/{api_stats['concurrency_limit']}",
+                  f"circuit {api_stats['breaker_state']}", delta_color="off")
+        st.caption(f"{api_stats.get('requests', 0)} requests · {api_stats.get('retries', 0)} retries · "
+                   f"{api_stats.get('hedges', 0)} hedged ({api_stats.get('hedge_wins', 0)} won) · "
+                   f"p95 {api_stats['p95_ms']['single']:.0f} ms single, {api_stats['p95_ms']['batch']:.0f} ms batch")
+    with col2:
+        # Connection pool status, to help size pool_min/pool_max.
+        st.subheader("Database connection pool")
+        pool_stats = get_pool_stats()
+        if pool_stats:
+            st.metric("Connections in use", f"{pool_stats['in_use']}/{pool_stats['max_connections']}",
+                      f"peak {pool_stats['peak_in_use']}", delta_color="off")
+            st.caption(f"{pool_stats['checkouts']} checkouts · avg wait {pool_stats['avg_wait_ms']:.1f} ms · "
+                       f"max wait {pool_stats['max_wait_ms']:.1f} ms · {pool_stats['timeouts']} timeouts")
+        else:
+            st.caption("The pool has not been created yet.")
+
+    if current["counters"]:
+        with st.expander("Counters"):
+            st.dataframe(pd.DataFrame([
+                {"Counter": name, "Labels": ", ".join(f"{key}={value}" for key, value in labels), "Value": value}
+                for (name, labels), value in sorted(current["counters"].items(), key=lambda item: str(item[0]))
+            ]), use_container_width=True, hide_index=True)
+
+    st.subheader("Export")
+    st.download_button("Download metrics (Prometheus format)", metrics.render_prometheus(),
+                       file_name="metrics.prom", mime="text/plain")
+    if metrics.METRICS_PORT:
+        st.caption(f"Also served at {metrics.start_metrics_server(metrics.METRICS_PORT)}.")
+    if metrics.METRICS_FILE:
+        st.caption(f"Also written to {metrics.METRICS_FILE} on every rerun.")
+    if st.button("Reset metrics"):
+        metrics.reset()
+        st.rerun()
+
+    st.subheader("Profiling")
+    st.caption("Runs the whole app script once under cProfile and lists the functions with the most cumulative time.")
+    if st.button("Profile a rerun"):
+        st.session_state.profile_next_rerun = True
+        st.rerun()
+    if profile_requested and not profiler:
+        st.info("Another rerun is being profiled right now; try again in a moment.")
+    for profile in metrics.recent_profiles():
+        with st.expander(f"{profile['label']} · {profile['total_s'] * 1000:.0f} ms"):
+            st.code(profile["report"], language=None)
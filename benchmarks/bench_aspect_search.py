@@ -0,0 +1,75 @@
+"""
+Compares the old ILIKE '%word%' aspect query with the indexed full-text
+search in get_aspect_counts / get_multi_aspect_counts.
+
+Needs a local Postgres. Point DATABASE_URL at a scratch database; its
+'reviews' table is TRUNCATED and refilled with synthetic reviews.
+
+    DATABASE_URL=postgresql://localhost/reviews_bench python -m benchmarks.bench_aspect_search --rows 1000000
+"""
+import argparse
+import time
+
+import database
+from benchmarks.synthetic import synthetic_reviews
+
+ASPECTS = ["staff", "bed", "location", "wifi"]
+
+
+def legacy_aspect_counts(keyword):
+    """The previous get_aspect_counts query: a leading-wildcard ILIKE scan."""
+    with database.db_connection() as conn:
+        with conn.cursor() as c:
+            c.execute(
+                "SELECT COUNT(*), COUNT(*) FILTER (WHERE predicted_label = 1), "
+                "COUNT(*) FILTER (WHERE predicted_label = 0) FROM reviews WHERE review_text ILIKE %s",
+                (f"%{keyword}%",)
+            )
+            return c.fetchone()
+
+
+def _timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="reuse the rows already loaded")
+    args = parser.parse_args()
+
+    database.setup_database()
+    if not args.keep:
+        with database.db_connection() as conn:
+            with conn.cursor() as c:
+                c.execute("TRUNCATE reviews, daily_sentiment")
+            conn.commit()
+        database.insert_bulk_reviews(synthetic_reviews(args.rows))
+        with database.db_connection() as conn:
+            conn.autocommit = True
+            with conn.cursor() as c:
+                c.execute("VACUUM ANALYZE reviews")
+            conn.autocommit = False
+
+    legacy_total = indexed_total = 0.0
+    for aspect in ASPECTS:
+        legacy, legacy_counts = _timed(lambda: legacy_aspect_counts(aspect), args.repeat)
+        indexed, counts = _timed(lambda: database.get_aspect_counts(aspect), args.repeat)
+        legacy_total += legacy
+        indexed_total += indexed
+        print(f"{aspect:>10}  ILIKE: {legacy * 1000:8.1f} ms ({legacy_counts[0]} matches)   "
+              f"full-text: {indexed * 1000:8.1f} ms ({counts['total_mentions']} matches)")
+
+    multi, _ = _timed(lambda: database.get_multi_aspect_counts(ASPECTS), args.repeat)
+    print(f"{len(ASPECTS)} aspects  ILIKE one by one: {legacy_total * 1000:8.1f} ms   "
+          f"full-text one by one: {indexed_total * 1000:8.1f} ms   single multi-aspect query: {multi * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compares the remote and local prediction backends: per-review latency with
+predict_sentiment_api and bulk throughput with predict_sentiment_batch.
+
+The remote backend talks to the local stub server with injected latency; the
+local backend uses a small TF-IDF + logistic regression model trained on
+synthetic reviews. The prediction cache is cleared before every run.
+
+    python -m benchmarks.bench_backends --latency 0.05 --rows 20000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import api_client
+from benchmarks.stub_server import start_stub_server
+from benchmarks.synthetic import synthetic_reviews
+
+
+def train_synthetic_model(path, n=20_000):
+    """Fits a TF-IDF + logistic regression pair on synthetic reviews and saves it with joblib."""
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    df = synthetic_reviews(n, seed=1)
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), min_df=2)
+    classifier = LogisticRegression(max_iter=1000).fit(vectorizer.fit_transform(df["review_text"]), df["predicted_label"])
+    joblib.dump({"vectorizer": vectorizer, "classifier": classifier}, path)
+    return path
+
+
+def _per_review_latencies(texts):
+    latencies = []
+    for text in texts:
+        api_client.clear_memory_cache()
+        start = time.perf_counter()
+        api_client.predict_sentiment_api(text)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _bulk_throughput(texts):
+    api_client.clear_memory_cache()
+    start = time.perf_counter()
+    results = api_client.predict_sentiment_batch(texts)
+    elapsed = time.perf_counter() - start
+    assert all(results), "every review should be scored"
+    return len(texts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000, help="reviews scored in the bulk run")
+    parser.add_argument("--singles", type=int, default=200, help="reviews scored one at a time")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(latency=args.latency)
+    api_client.API_URL = url
+    api_client.CACHE_USE_DATABASE = False
+    texts = synthetic_reviews(args.rows, seed=2)["review_text"].tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        api_client.LOCAL_MODEL_PATH = train_synthetic_model(os.path.join(tmp, "model.joblib"))
+        try:
+            for backend in ("remote", "local"):
+                api_client.PREDICTION_BACKEND = backend
+                if backend == "local":
+                    start = time.perf_counter()
+                    api_client.get_local_model()
+                    print(f"local model loaded once in {(time.perf_counter() - start) * 1000:.0f} ms")
+                latencies = _per_review_latencies(texts[:args.singles])
+                throughput = _bulk_throughput(texts)
+                print(f"{backend:>7}: per review p50 {statistics.median(latencies) * 1000:8.2f} ms  "
+                      f"max {max(latencies) * 1000:8.2f} ms   bulk {throughput:10.0f} reviews/s")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
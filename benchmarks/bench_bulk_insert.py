@@ -0,0 +1,66 @@
+"""
+Compares the old execute_values insert with the COPY + staging-table loader
+in insert_bulk_reviews.
+
+Needs a local Postgres. Point DATABASE_URL at a scratch database; its
+'reviews' table is TRUNCATED before every run.
+
+    DATABASE_URL=postgresql://localhost/reviews_bench python -m benchmarks.bench_bulk_insert --rows 100000 1000000
+"""
+import argparse
+import time
+
+import database
+from benchmarks.synthetic import synthetic_reviews
+
+
+def _truncate():
+    with database.db_connection() as conn:
+        with conn.cursor() as c:
+            c.execute("TRUNCATE reviews")
+        conn.commit()
+
+
+def legacy_insert(df):
+    """The previous insert_bulk_reviews body: one tuple per row through execute_values."""
+    from psycopg2.extras import execute_values
+    with database.db_connection() as conn:
+        with conn.cursor() as c:
+            tuples = [tuple(x) for x in df.to_numpy()]
+            cols = ','.join(list(df.columns))
+            execute_values(c, f"INSERT INTO reviews ({cols}) VALUES %s", tuples)
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    database.setup_database()
+    for n in args.rows:
+        df = synthetic_reviews(n)
+
+        _truncate()
+        start = time.perf_counter()
+        legacy_insert(df)
+        legacy = time.perf_counter() - start
+        print(f"{n:>9} rows  execute_values: {legacy:7.2f}s  {n / legacy:10.0f} rows/s")
+
+        _truncate()
+        start = time.perf_counter()
+        result = database.insert_bulk_reviews(df)
+        copy = time.perf_counter() - start
+        print(f"{n:>9} rows  COPY + merge:   {copy:7.2f}s  {n / copy:10.0f} rows/s  ({legacy / copy:.1f}x)  "
+              f"inserted={result['inserted']} skipped={result['skipped']}")
+
+        start = time.perf_counter()
+        result = database.insert_bulk_reviews(df)
+        again = time.perf_counter() - start
+        print(f"{n:>9} rows  re-upload:      {again:7.2f}s  {n / again:10.0f} rows/s  "
+              f"inserted={result['inserted']} skipped={result['skipped']}")
+    _truncate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compares sequential scoring (the old Bulk Upload loop) with predict_sentiment_batch
+against a local stub /predict server with injected latency, first with one review
+per request and then with multi-review chunks. The prediction cache is cleared
+before every run (and its Postgres tier disabled) so each run hits the server;
+a final run shows a warm-cache rescoring of the same file.
+
+    python -m benchmarks.bench_bulk_scoring --rows 500 --latency 0.05
+"""
+import argparse
+import time
+
+import api_client
+from benchmarks.stub_server import start_stub_server
+
+
+def _reviews(n):
+    return [f"Review {i}: the room was clean and the staff were friendly." for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[8, 32, 128])
+    args = parser.parse_args()
+
+    server, url = start_stub_server(latency=args.latency)
+    api_client.API_URL = url
+    api_client.CACHE_USE_DATABASE = False
+    texts = _reviews(args.rows)
+
+    try:
+        api_client.clear_memory_cache()
+        start = time.perf_counter()
+        sequential = [api_client.predict_sentiment_api(text) for text in texts]
+        baseline = time.perf_counter() - start
+        print(f"{'sequential':>16}: {baseline:7.2f}s  {args.rows / baseline:8.1f} reviews/s")
+
+        def run(name, warm=False, **kwargs):
+            if not warm:
+                api_client.clear_memory_cache()
+            start = time.perf_counter()
+            results = api_client.predict_sentiment_batch(texts, **kwargs)
+            elapsed = time.perf_counter() - start
+            assert results == sequential, "batch results must match sequential results in input order"
+            print(f"{name:>16}: {elapsed:7.2f}s  {args.rows / elapsed:8.1f} reviews/s  ({baseline / elapsed:.1f}x)")
+
+        for concurrency in args.concurrency:
+            run(f"concurrency={concurrency}", max_concurrency=concurrency, chunk_size=1)
+        for chunk_size in args.chunk_size:
+            run(f"chunk={chunk_size}", chunk_size=chunk_size)
+        run("warm cache", warm=True)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
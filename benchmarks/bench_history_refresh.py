@@ -0,0 +1,60 @@
+"""
+Compares reloading the whole reviews table (fetch_all_reviews, what the
+Review History button used to do) with an incremental refresh of the shared
+ReviewHistoryCache, for tables of different sizes and batches of new rows.
+
+Needs a local Postgres. Point DATABASE_URL at a scratch database; its
+'reviews' table is TRUNCATED and refilled with synthetic reviews.
+
+    DATABASE_URL=postgresql://localhost/reviews_bench python -m benchmarks.bench_history_refresh --rows 100000 1000000
+"""
+import argparse
+import time
+
+import database
+from benchmarks.synthetic import synthetic_reviews
+from history_cache import ReviewHistoryCache
+
+
+def _truncate():
+    with database.db_connection() as conn:
+        with conn.cursor() as c:
+            c.execute("TRUNCATE reviews, daily_sentiment, aspect_index")
+        conn.commit()
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--new", type=int, nargs="+", default=[0, 100, 1_000, 10_000])
+    args = parser.parse_args()
+
+    database.setup_database()
+    for n in args.rows:
+        _truncate()
+        database.insert_bulk_reviews(synthetic_reviews(n))
+        full, df = _timed(database.fetch_all_reviews)
+        print(f"{n:>9} rows  full reload (fetch_all_reviews): {full * 1000:8.0f} ms  ({len(df)} rows)")
+
+        cache = ReviewHistoryCache(max_rows=n + sum(args.new))
+        initial, df = _timed(lambda: cache.refresh(force=True))
+        print(f"{n:>9} rows  first cache load:                {initial * 1000:8.0f} ms  ({len(df)} rows)")
+
+        for i, new in enumerate(args.new):
+            if new:
+                database.insert_bulk_reviews(synthetic_reviews(new, start=f"{2030 + i}-01-01", days=30, seed=100 + i))
+            fetch, _ = _timed(lambda: cache._fetch_new_rows())
+            combine, df = _timed(cache._combined)
+            print(f"{n:>9} rows  +{new:<6} incremental refresh: {(fetch + combine) * 1000:8.1f} ms  "
+                  f"(query {fetch * 1000:7.1f} ms, append {combine * 1000:6.1f} ms, {len(df)} rows)")
+    _truncate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Compares the unpartitioned reviews table with the monthly partitioned
+layout: date-range queries, deleting the oldest year of reviews
+(drop_reviews_before), and the cost of migrate_reviews_to_partitioned.
+
+The same synthetic reviews (five years) are loaded into the old layout,
+queried, and their first year deleted; the table is then migrated and the
+partitioned layout is queried and has its next year dropped.
+
+Needs a local Postgres. Point DATABASE_URL at a scratch database; its
+'reviews' table is DROPPED and recreated.
+
+    DATABASE_URL=postgresql://localhost/reviews_bench python -m benchmarks.bench_partitions --rows 1000000
+"""
+import argparse
+import re
+import time
+from datetime import date
+
+import database
+import metrics
+from benchmarks.synthetic import synthetic_reviews
+
+START = date(2020, 1, 1)
+# (name, first day, last day exclusive), all after the years the retention runs delete.
+RANGES = [
+    ("1 day", date(2023, 3, 14), date(2023, 3, 15)),
+    ("1 week", date(2023, 6, 5), date(2023, 6, 12)),
+    ("1 month", date(2023, 9, 1), date(2023, 10, 1)),
+    ("1 quarter", date(2024, 1, 1), date(2024, 4, 1)),
+]
+QUERIES = {
+    "counts": "SELECT predicted_label, COUNT(*) FROM reviews WHERE timestamp >= %s AND timestamp < %s GROUP BY 1",
+    "rows": "SELECT timestamp, review_text, predicted_label FROM reviews "
+            "WHERE timestamp >= %s AND timestamp < %s ORDER BY timestamp DESC",
+}
+
+
+def _execute(sql, params=(), autocommit=False):
+    with database.db_connection() as conn:
+        conn.autocommit = autocommit
+        try:
+            with conn.cursor() as c:
+                c.execute(sql, params)
+                rows = c.fetchall() if c.description else None
+            if not autocommit:
+                conn.commit()
+        finally:
+            conn.autocommit = False
+    return rows
+
+
+def create_legacy_table():
+    """The reviews table as setup_database created it before partitioning."""
+    if not database.setup_database():  # on a fresh database, creates the rollup tables truncated below
+        raise SystemExit(1)
+    _execute("DROP TABLE IF EXISTS reviews CASCADE")
+    _execute("DROP SEQUENCE IF EXISTS reviews_id_seq")
+    _execute("TRUNCATE daily_sentiment, aspect_index")
+    _execute("CREATE TABLE reviews (id SERIAL PRIMARY KEY, timestamp TIMESTAMP, review_text TEXT, predicted_label INTEGER)")
+    database.setup_database()  # adds the dedup key and full-text index to the existing table
+
+
+def _best(sql, params, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = _execute(sql, params)
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+
+def _partitions_scanned(sql, params):
+    plan = "\n".join(line for (line,) in _execute("EXPLAIN " + sql, params))
+    return len(set(re.findall(r" on (reviews_p\d{4}_\d{2}|reviews_default)\b", plan)))
+
+
+def run_queries(layout, repeat):
+    for name, first, last in RANGES:
+        for kind, sql in QUERIES.items():
+            seconds, rows = _best(sql, (first, last), repeat)
+            matched = sum(count for _, count in rows) if kind == "counts" else len(rows)
+            scanned = _partitions_scanned(sql, (first, last)) if layout == "partitioned" else "-"
+            print(f"{layout:<12} {name:<10} {kind:<7} {seconds * 1000:9.1f} ms  {matched:>8} reviews  "
+                  f"partitions scanned: {scanned}")
+
+
+def run_retention(layout, cutoff):
+    metrics.reset()
+    start = time.perf_counter()
+    result = database.drop_reviews_before(cutoff)
+    total = time.perf_counter() - start
+    stages = {stage["stage"]: stage["total_s"] for stage in metrics.snapshot()["stages"]}
+    removal = stages.get("db.retention_delete", 0) + stages.get("db.retention_drop_partition", 0)
+    print(f"{layout:<12} delete before {cutoff}: {result['rows_deleted']} reviews in {total:6.2f}s "
+          f"(DELETE/DROP {removal * 1000:8.1f} ms, rollup fix-ups {stages.get('db.retention_rollups', 0):6.2f}s, "
+          f"{result['partitions_dropped']} partitions dropped)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    create_legacy_table()
+    database.insert_bulk_reviews(synthetic_reviews(args.rows, start=START.isoformat(), days=5 * 365))
+    _execute("VACUUM ANALYZE reviews", autocommit=True)
+    print(f"{args.rows} reviews from {START} over five years")
+
+    run_queries("unpartitioned", args.repeat)
+    run_retention("unpartitioned", date(START.year + 1, 1, 1))
+    start = time.perf_counter()
+    _execute("VACUUM reviews", autocommit=True)
+    print(f"{'unpartitioned':<12} VACUUM after the delete: {time.perf_counter() - start:6.2f}s")
+
+    start = time.perf_counter()
+    moved = database.migrate_reviews_to_partitioned()
+    print(f"migrate-partitions: {moved} reviews in {time.perf_counter() - start:6.2f}s")
+    _execute("VACUUM ANALYZE reviews", autocommit=True)
+
+    run_queries("partitioned", args.repeat)
+    run_retention("partitioned", date(START.year + 2, 1, 1))
+
+
+if __name__ == "__main__":
+    main()
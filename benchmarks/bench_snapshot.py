@@ -0,0 +1,81 @@
+"""
+Compares loading reviews with pd.read_sql_query (fetch_all_reviews) against
+the memory-mapped Arrow snapshot: load time and DataFrame memory, with and
+without the review text, plus the cost of exporting and of an incremental
+snapshot refresh.
+
+Needs a local Postgres. Point DATABASE_URL at a scratch database; its
+'reviews' table is TRUNCATED and refilled with synthetic reviews. The
+snapshot is written to a temporary directory.
+
+    DATABASE_URL=postgresql://localhost/reviews_bench python -m benchmarks.bench_snapshot --rows 100000 1000000
+"""
+import argparse
+import tempfile
+import time
+
+import database
+import snapshot
+from benchmarks.synthetic import synthetic_reviews
+
+
+def _truncate():
+    with database.db_connection() as conn:
+        with conn.cursor() as c:
+            c.execute("TRUNCATE reviews, daily_sentiment, aspect_index")
+        conn.commit()
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def _report(n, name, seconds, df):
+    megabytes = df.memory_usage(deep=True).sum() / 2**20
+    print(f"{n:>9} rows  {name:<34} {seconds * 1000:8.0f} ms  {megabytes:9.1f} MiB  "
+          f"{', '.join(f'{col}:{dtype}' for col, dtype in df.dtypes.items())}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--new", type=int, default=1_000, help="rows added before the incremental refresh")
+    args = parser.parse_args()
+
+    database.setup_database()
+    for n in args.rows:
+        _truncate()
+        database.insert_bulk_reviews(synthetic_reviews(n))
+        with database.db_connection() as conn:
+            conn.autocommit = True
+            with conn.cursor() as c:
+                c.execute("VACUUM ANALYZE reviews")
+            conn.autocommit = False
+
+        seconds, df = _timed(database.fetch_all_reviews)
+        _report(n, "read_sql_query (fetch_all_reviews)", seconds, df)
+        del df
+
+        with tempfile.TemporaryDirectory() as directory:
+            seconds, info = _timed(lambda: snapshot.refresh_snapshot(directory))
+            print(f"{n:>9} rows  {'snapshot export':<34} {seconds * 1000:8.0f} ms  "
+                  f"{info['bytes'] / 2**20:9.1f} MiB on disk")
+
+            database.insert_bulk_reviews(synthetic_reviews(args.new, start="2030-01-01", days=30, seed=7))
+            seconds, info = _timed(lambda: snapshot.refresh_snapshot(directory))
+            label = f"incremental refresh (+{info['rows_added']})"
+            print(f"{n:>9} rows  {label:<34} {seconds * 1000:8.0f} ms")
+
+            seconds, df = _timed(lambda: snapshot.load_snapshot(directory))
+            _report(n, "snapshot, timestamp + label", seconds, df)
+            del df
+            seconds, df = _timed(lambda: snapshot.load_snapshot(directory, columns=database.REVIEW_COLUMNS))
+            _report(n, "snapshot, with text", seconds, df)
+            del df
+    _truncate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Measures cold-start cost: how long a fresh interpreter takes to import the
+app's modules, which imports dominate that time, and how long the first and
+a repeat render of app.py take under Streamlit's AppTest harness.
+
+Every measurement runs in a new subprocess so nothing is already imported or
+initialised. Point DATABASE_URL at a scratch database to include schema setup
+in the first render; without one the render measures the no-database path.
+
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULES = ["text_processing", "database", "dashboard", "api_client", "ingest"]
+
+_IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {modules}
+print(time.perf_counter() - start)
+"""
+
+_RENDER_SCRIPT = """
+import time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=120)
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+print(first, time.perf_counter() - start)
+"""
+
+
+def _run(args):
+    result = subprocess.run([sys.executable, *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return result
+
+
+def import_seconds():
+    """Wall time to import the app modules in a fresh interpreter."""
+    return float(_run(["-c", _IMPORT_SCRIPT.format(modules=", ".join(APP_MODULES))]).stdout.split()[-1])
+
+
+def slowest_imports(top=10):
+    """The top-level packages with the largest cumulative import time, from python -X importtime."""
+    stderr = _run(["-X", "importtime", "-c", "import " + ", ".join(APP_MODULES)]).stderr
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cum.isdigit() and "." not in name:  # top-level packages only; their cumulative time includes submodules
+            cumulative[name] = max(cumulative.get(name, 0), int(cum))
+    return sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def render_seconds():
+    """(first render, repeat render) wall times for app.py in a fresh interpreter."""
+    first, again = _run(["-c", _RENDER_SCRIPT]).stdout.split()[-2:]
+    return float(first), float(again)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-render", action="store_true", help="skip the AppTest render timing")
+    args = parser.parse_args()
+
+    imports = [import_seconds() for _ in range(args.repeat)]
+    print(f"import {', '.join(APP_MODULES)}: median {statistics.median(imports) * 1000:7.0f} ms  "
+          f"min {min(imports) * 1000:7.0f} ms")
+    print("slowest top-level imports (cumulative):")
+    for name, micros in slowest_imports():
+        print(f"  {name:<20} {micros / 1000:8.1f} ms")
+
+    if not args.no_render:
+        renders = [render_seconds() for _ in range(args.repeat)]
+        print(f"first render of app.py:  median {statistics.median(r[0] for r in renders) * 1000:7.0f} ms")
+        print(f"repeat render (rerun):   median {statistics.median(r[1] for r in renders) * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Measures the API client's tail-latency controls (retries with jittered
+backoff, hedging after p95, AIMD concurrency, circuit breaker) against the
+stub server with injected faults, compared with the same client with every
+control switched off.
+
+Each run scores unique reviews one call at a time from several threads with
+predict_sentiment_api, recording per-call latency whether or not it
+succeeded. The prediction cache's Postgres tier is disabled.
+
+    python -m benchmarks.bench_tail_latency --calls 2000 --threads 16
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import api_client
+from benchmarks.stub_server import start_stub_server
+
+SCENARIOS = [
+    ("healthy", {}),
+    ("5% slow (1s)", {"tail_rate": 0.05, "tail_latency": 1.0}),
+    ("10% errors (503)", {"error_rate": 0.1}),
+    ("capacity 8 (429)", {"capacity": 8}),
+    ("outage (all 503)", {"down": True}),
+]
+
+
+def _configure(controlled):
+    api_client.RETRY_ATTEMPTS = 3 if controlled else 1
+    api_client.HEDGE_ENABLED = controlled
+    api_client.ADAPTIVE_CONCURRENCY = controlled
+    api_client.BREAKER_FAILURE_THRESHOLD = 5 if controlled else 10**9
+    api_client.reset_api_controls()
+    api_client.clear_memory_cache()
+
+
+def _run(texts, threads):
+    latencies, successes, lock = [], [0], threading.Lock()
+
+    def work(share):
+        for text in share:
+            start = time.perf_counter()
+            ok = api_client.predict_sentiment_api(text) is not None
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                successes[0] += ok
+
+    workers = [threading.Thread(target=work, args=(texts[i::threads],)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, successes[0], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    api_client.CACHE_USE_DATABASE = False
+    for name, faults in SCENARIOS:
+        down = faults.pop("down", False)
+        server, url = start_stub_server(latency=args.latency, **faults)
+        server.down = down
+        api_client.API_URL = url
+        try:
+            for mode, controlled in (("plain", False), ("controlled", True)):
+                _configure(controlled)
+                texts = [f"{name} {mode} review {i}: the staff were friendly" for i in range(args.calls)]
+                served_before = server.requests_served
+                latencies, ok, elapsed = _run(texts, args.threads)
+                quantiles = statistics.quantiles(latencies, n=100)
+                stats = api_client.get_api_stats()
+                print(f"{name:<18} {mode:<10}  p50 {quantiles[49] * 1000:7.1f} ms  p99 {quantiles[98] * 1000:7.1f} ms  "
+                      f"ok {100 * ok / args.calls:5.1f}%  {ok / elapsed:7.1f} ok/s  "
+                      f"server hits {server.requests_served - served_before:5d}  "
+                      f"retries {stats.get('retries', 0):4d}  hedges {stats.get('hedges', 0):3d}  "
+                      f"fast-fails {stats.get('breaker_rejections', 0):4d}  limit {stats['concurrency_limit']}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
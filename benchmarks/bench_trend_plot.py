@@ -0,0 +1,76 @@
+"""
+Compares the old one-point-per-day trend figure with the adaptive one from
+create_daily_trend_plot on synthetic multi-year histories: figure JSON size
+(what Streamlit sends to the browser on each rerun) and the time to build
+and serialize it. No database needed.
+
+    python -m benchmarks.bench_trend_plot --years 1 5 --reviews-per-day 200
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from dashboard import create_daily_trend_plot
+
+
+def synthetic_daily_counts(years, reviews_per_day, seed=0):
+    """Daily happy / not happy counts with a weekly cycle and noise, shaped like the daily_sentiment rollup."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range("2020-01-01", periods=int(years * 365), freq="D")
+    weekly = 1 + 0.3 * np.sin(2 * np.pi * np.arange(len(days)) / 7)
+    totals = rng.poisson(reviews_per_day * weekly)
+    happy = rng.binomial(totals, 0.7)
+    return pd.DataFrame({
+        "date": np.repeat(days.date, 2),
+        "predicted_label": np.tile([1, 0], len(days)),
+        "count": np.column_stack([happy, totals - happy]).ravel(),
+    })
+
+
+def legacy_trend_plot(daily_counts):
+    """The previous create_daily_trend_plot: every day plotted, with markers."""
+    import plotly.express as px
+    daily_counts = daily_counts.assign(Sentiment=daily_counts['predicted_label'].map({1: 'Happy', 0: 'Not Happy'}))
+    daily_counts = daily_counts.dropna(subset=['Sentiment']).rename(columns={'count': 'Count'})
+    fig = px.line(daily_counts, x='date', y='Count', color='Sentiment', title="Daily Sentiment Trend",
+                  labels={'date': 'Date', 'Count': 'Number of Reviews'},
+                  color_discrete_map={'Happy': 'mediumseagreen', 'Not Happy': 'indianred'},
+                  markers=True, template='plotly_white')
+    fig.update_layout(title_x=0.5, xaxis_title="Date", yaxis_title="Number of Reviews", legend_title_text=None,
+                      legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                      xaxis=dict(rangeslider=dict(visible=True), type="date"))
+    fig.update_traces(line=dict(width=2.5))
+    return fig
+
+
+def _measure(build, daily_counts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = build(daily_counts)
+        payload = fig.to_json()
+        best = min(best, time.perf_counter() - start)
+    return best, len(payload), sum(len(trace.x) for trace in fig.data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 5])
+    parser.add_argument("--reviews-per-day", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    create_daily_trend_plot(synthetic_daily_counts(0.1, 10))  # import plotly outside the timings
+    for years in args.years:
+        daily = synthetic_daily_counts(years, args.reviews_per_day)
+        for name, build in [("daily + markers (old)", legacy_trend_plot), ("adaptive", create_daily_trend_plot),
+                            ("adaptive, no LTTB", lambda d: create_daily_trend_plot(d, downsample=False))]:
+            seconds, size, points = _measure(build, daily, args.repeat)
+            print(f"{years:>4g} years  {name:<22} {points:6d} points  {size / 1024:8.1f} KiB  "
+                  f"build + to_json {seconds * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
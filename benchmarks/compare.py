@@ -0,0 +1,65 @@
+"""
+Compares two result files written by benchmarks.suite, case by case, and
+flags cases that got slower by more than a threshold.
+
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json --threshold 0.10
+
+Exits with status 1 if any case regressed, so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+
+def _load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report, {(r["case"], r["rows"]): r for r in report["results"]}
+
+
+def compare(baseline, candidate, threshold):
+    """
+    Pairs up the cases present in both result sets.
+
+    Returns:
+        A list of (case, rows, baseline seconds, candidate seconds, change, status)
+        tuples, where change is the relative difference in seconds (positive
+        means slower) and status is 'regressed', 'improved' or 'same'.
+    """
+    rows = []
+    for key in sorted(baseline.keys() & candidate.keys(), key=lambda key: (key[1], key[0])):
+        before, after = baseline[key]["seconds"], candidate[key]["seconds"]
+        change = (after - before) / before if before else 0.0
+        status = "regressed" if change > threshold else "improved" if change < -threshold else "same"
+        rows.append((key[0], key[1], before, after, change, status))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark suite result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    baseline_report, baseline = _load(args.baseline)
+    candidate_report, candidate = _load(args.candidate)
+    print(f"baseline:  {args.baseline} ({baseline_report.get('git_commit')}, {baseline_report.get('started_at')})")
+    print(f"candidate: {args.candidate} ({candidate_report.get('git_commit')}, {candidate_report.get('started_at')})")
+
+    rows = compare(baseline, candidate, args.threshold)
+    for case, n, before, after, change, status in rows:
+        marker = {"regressed": "  <-- slower", "improved": "  faster"}.get(status, "")
+        print(f"{n:>9} rows  {case:<30} {before * 1000:10.1f} ms -> {after * 1000:10.1f} ms  {change:+7.1%}{marker}")
+    for label, keys in (("only in baseline", baseline.keys() - candidate.keys()),
+                        ("only in candidate", candidate.keys() - baseline.keys())):
+        if keys:
+            print(f"{label}: {', '.join(f'{case}@{n}' for case, n in sorted(keys))}")
+
+    regressed = sum(status == "regressed" for *_, status in rows)
+    print(f"{len(rows)} cases compared, {regressed} regressed beyond {args.threshold:.0%}.")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+A local stand-in for the deployed /predict endpoint, used by the benchmarks.
+
+Run it on its own with:
+
+    python -m benchmarks.stub_server --port 8000 --latency 0.05
+
+By default it also accepts multi-review payloads ({"texts": [...]} ->
+{"predictions": [...]}); pass --no-batch to mimic a single-review-only API.
+
+Faults can be injected to exercise the client's retries, hedging, adaptive
+concurrency and circuit breaker:
+
+    python -m benchmarks.stub_server --error-rate 0.05 --tail-rate 0.02 --tail-latency 2 --capacity 16
+
+--max-body-bytes answers larger requests with 413, like a proxy's body size limit.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _fake_prediction(text):
+    """Deterministic prediction in the same shape as the real API."""
+    happy = sum(map(ord, text)) % 3 != 0
+    return {"predicted_label": 1 if happy else 0, "probabilities": [0.2, 0.8] if happy else [0.7, 0.3]}
+
+
+class StubPredictHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests.
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, delayed ACKs add ~40ms per request.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        with server.lock:
+            server.requests_served += 1
+            server.in_flight += 1
+            overloaded = server.capacity is not None and server.in_flight > server.capacity
+        try:
+            if server.max_body_bytes is not None and len(body) > server.max_body_bytes:
+                self._send_json(413, {"detail": "request body too large"})
+            elif server.down or random.random() < server.error_rate:
+                time.sleep(server.latency)
+                self._send_json(503, {"detail": "injected failure"})
+            elif overloaded:
+                self._send_json(429, {"detail": "too many concurrent requests"})
+            else:
+                slow = random.random() < server.tail_rate
+                time.sleep(server.tail_latency if slow else server.latency)
+                self._predict(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _predict(self, body):
+        try:
+            payload = json.loads(body)
+            if self.server.batch and "texts" in payload:
+                response = {"predictions": [
+                    _fake_prediction(text) if isinstance(text, str) else {"error": "text must be a string"}
+                    for text in payload["texts"]
+                ]}
+            else:
+                response = _fake_prediction(payload["text"])
+            status = 200
+        except (ValueError, KeyError, TypeError):
+            response = {"detail": "expected a JSON body with a 'text' field"}
+            status = 422
+        self._send_json(status, response)
+
+    def _send_json(self, status, obj):
+        data = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+
+def start_stub_server(latency=0.05, host="127.0.0.1", port=0, batch=True,
+                      error_rate=0.0, tail_rate=0.0, tail_latency=1.0, capacity=None, max_body_bytes=None):
+    """
+    Starts the stub server on a background thread.
+
+    Args:
+        latency: Seconds of delay added to every request.
+        batch: Whether multi-review payloads are accepted.
+        error_rate: Share of requests answered with HTTP 503.
+        tail_rate: Share of requests delayed by tail_latency instead of latency.
+        tail_latency: Seconds of delay for the slow requests.
+        capacity: Concurrent requests served; beyond that requests get HTTP 429.
+        max_body_bytes: Larger request bodies get HTTP 413.
+
+    Set server.down = True to fail every request with 503 until it is reset.
+
+    Returns:
+        A (server, url) tuple. Call server.shutdown() when finished.
+    """
+    server = ThreadingHTTPServer((host, port), StubPredictHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.batch = batch
+    server.error_rate = error_rate
+    server.tail_rate = tail_rate
+    server.tail_latency = tail_latency
+    server.capacity = capacity
+    server.max_body_bytes = max_body_bytes
+    server.down = False
+    server.lock = threading.Lock()
+    server.requests_served = 0
+    server.in_flight = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/predict"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds of delay added to every request")
+    parser.add_argument("--no-batch", action="store_true", help="reject multi-review payloads")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="share of requests delayed by --tail-latency")
+    parser.add_argument("--tail-latency", type=float, default=1.0)
+    parser.add_argument("--capacity", type=int, help="concurrent requests served before answering 429")
+    parser.add_argument("--max-body-bytes", type=int, help="answer larger request bodies with 413")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.latency, args.host, args.port, batch=not args.no_batch,
+                                    error_rate=args.error_rate, tail_rate=args.tail_rate,
+                                    tail_latency=args.tail_latency, capacity=args.capacity,
+                                    max_body_bytes=args.max_body_bytes)
+    print(f"Stub model API listening on {url} (latency {args.latency}s). Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
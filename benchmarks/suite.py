@@ -0,0 +1,187 @@
+"""
+Runs the main hot paths at several data sizes and writes the timings to a
+JSON file, so runs can be compared with benchmarks.compare:
+
+    scoring    predict_sentiment_batch against the local stub /predict server
+    database   insert_bulk_reviews, fetch_all_reviews and get_aspect_counts
+    plots      create_sentiment_distribution_plot, create_time_series_plot
+               and create_daily_trend_plot
+
+Everything runs offline. The model API is replaced by benchmarks.stub_server
+(latency and error rate are configurable) and the reviews come from
+benchmarks.synthetic with a fixed seed. The database cases need a local
+Postgres: point DATABASE_URL at a scratch database, whose 'reviews' table is
+TRUNCATED. Without DATABASE_URL they are skipped.
+
+    DATABASE_URL=postgresql://localhost/reviews_bench python -m benchmarks.suite
+    python -m benchmarks.suite --rows 10000 --groups scoring plots --output before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import api_client
+import dashboard
+import database
+import metrics
+from benchmarks.stub_server import start_stub_server
+from benchmarks.synthetic import synthetic_reviews
+
+GROUPS = ("scoring", "database", "plots")
+DEFAULT_ROWS = (10_000, 100_000, 1_000_000)
+ASPECTS = ["staff", "bed", "location", "wifi"]
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+def _measure(fn, repeat):
+    """Runs fn repeat times. Returns (per-run seconds, last result, stage totals of the last run)."""
+    runs, result, stages = [], None, {}
+    for _ in range(max(1, repeat)):
+        metrics.reset()
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+        stages = {s["stage"]: {"count": s["count"], "total_s": s["total_s"], "errors": s["errors"]}
+                  for s in metrics.snapshot()["stages"]}
+    return runs, result, stages
+
+
+class Suite:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def run(self, case, rows, fn, repeat=None, **extra):
+        """Times one case, prints a line and keeps the result. Returns fn's last result."""
+        runs, result, stages = _measure(fn, self.repeat if repeat is None else repeat)
+        best = min(runs)
+        self.results.append({
+            "case": case,
+            "rows": rows,
+            "seconds": best,
+            "runs": runs,
+            "rows_per_sec": rows / best if best else None,
+            "stages": stages,
+            **extra,
+        })
+        print(f"{rows:>9} rows  {case:<30} {best * 1000:10.1f} ms  {rows / best if best else 0:12.0f} rows/s", flush=True)
+        return result
+
+
+def _truncate():
+    with database.db_connection() as conn:
+        with conn.cursor() as c:
+            c.execute("TRUNCATE reviews, daily_sentiment, aspect_index")
+        conn.commit()
+
+
+def _vacuum_analyze():
+    with database.db_connection() as conn:
+        conn.autocommit = True
+        with conn.cursor() as c:
+            c.execute("VACUUM ANALYZE reviews")
+        conn.autocommit = False
+
+
+def bench_scoring(suite, df, args):
+    """Scores every review once with cold caches; the Postgres cache tier is off so each run hits the server."""
+    texts = df["review_text"].tolist()
+    server, url = start_stub_server(latency=args.latency, error_rate=args.error_rate)
+    api_client.API_URL = url
+    api_client.CACHE_USE_DATABASE = False
+    api_client.reset_api_controls()
+
+    def score():
+        api_client.clear_memory_cache()
+        return api_client.predict_sentiment_batch(texts)
+
+    try:
+        results = suite.run("scoring.predict_batch", len(texts), score, repeat=1,
+                            latency=args.latency, error_rate=args.error_rate)
+        failed = sum(result is None for result in results)
+        if failed:
+            print(f"{'':>15}{failed} reviews failed to score", flush=True)
+        suite.results[-1]["failed"] = failed
+        suite.run("scoring.warm_cache", len(texts), lambda: api_client.predict_sentiment_batch(texts))
+    finally:
+        server.shutdown()
+
+
+def bench_database(suite, df, args):
+    n = len(df)
+    _truncate()
+    summary = suite.run("db.insert_bulk_reviews", n, lambda: database.insert_bulk_reviews(df), repeat=1)
+    if not summary or summary["inserted"] != n:
+        raise RuntimeError(f"insert_bulk_reviews stored {summary and summary['inserted']} of {n} reviews")
+    _vacuum_analyze()
+    suite.run("db.fetch_all_reviews", n, database.fetch_all_reviews)
+    for aspect in ASPECTS:
+        suite.run(f"db.get_aspect_counts[{aspect}]", n, lambda: database.get_aspect_counts(aspect))
+    suite.run("db.get_multi_aspect_counts", n, lambda: database.get_multi_aspect_counts(ASPECTS))
+
+
+def bench_plots(suite, df, args):
+    n = len(df)
+    daily = df.groupby([df["timestamp"].dt.floor("D").rename("date"), "predicted_label"]).size().reset_index(name="count")
+    suite.run("plot.sentiment_distribution", n, lambda: dashboard.create_sentiment_distribution_plot(df))
+    suite.run("plot.time_series", n, lambda: dashboard.create_time_series_plot(df))
+    suite.run("plot.daily_trend", n, lambda: dashboard.create_daily_trend_plot(daily), days=len(daily))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and save the results as JSON.")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS))
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per read-only case; the best is reported")
+    parser.add_argument("--latency", type=float, default=0.01, help="stub server latency per request, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub requests answered with 503")
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_DIR}/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    groups = list(args.groups)
+    if "database" in groups and not os.environ.get("DATABASE_URL"):
+        print("DATABASE_URL is not set; skipping the database cases.", file=sys.stderr)
+        groups.remove("database")
+    if "database" in groups and not database.setup_database():
+        return 1
+
+    started = datetime.now(timezone.utc)
+    suite = Suite(args.repeat)
+    for n in args.rows:
+        df = synthetic_reviews(n)
+        for group in groups:
+            {"scoring": bench_scoring, "database": bench_database, "plots": bench_plots}[group](suite, df, args)
+    if "database" in groups:
+        _truncate()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{started:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "started_at": started.isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "results": suite.results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
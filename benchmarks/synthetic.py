@@ -0,0 +1,46 @@
+"""Synthetic hotel reviews for the benchmarks."""
+import numpy as np
+import pandas as pd
+
+_OPENERS = ["The", "Our", "My", "Honestly the", "Overall the"]
+_ASPECTS = ["room", "rooms", "staff", "bed", "beds", "location", "wifi", "breakfast", "bathroom", "pool",
+            "reception", "view", "parking", "restaurant", "noise", "price", "cleanliness", "shower"]
+_HAPPY = ["was wonderful", "were very helpful", "was spotless", "exceeded our expectations", "was perfect",
+          "was comfortable", "made the stay great"]
+_UNHAPPY = ["was dirty", "were rude", "was terrible", "kept us awake", "was overpriced", "was broken",
+            "was a real disappointment"]
+
+
+def synthetic_reviews(n, start="2020-01-01", days=5 * 365, happy_share=0.7, seed=0):
+    """
+    Returns a DataFrame with 'timestamp', 'review_text' and 'predicted_label'
+    columns, in the shape insert_bulk_reviews expects. Every row is unique.
+    """
+    rng = np.random.default_rng(seed)
+    labels = (rng.random(n) < happy_share).astype(np.int64)
+    openers = np.array(_OPENERS)[rng.integers(len(_OPENERS), size=n)]
+    aspects = np.array(_ASPECTS)[rng.integers(len(_ASPECTS), size=(n, 2))]
+    happy = np.array(_HAPPY)[rng.integers(len(_HAPPY), size=n)]
+    unhappy = np.array(_UNHAPPY)[rng.integers(len(_UNHAPPY), size=n)]
+    verdicts = np.where(labels == 1, happy, unhappy)
+
+    text = pd.Series(openers).str.cat([
+        pd.Series(aspects[:, 0]),
+        pd.Series(verdicts),
+        pd.Series(np.full(n, "and the")),
+        pd.Series(aspects[:, 1]),
+        pd.Series(np.where(labels == 1, "was fine.", "could be better.")),
+        pd.Series(np.arange(n).astype(str)).radd("Ref #"),
+    ], sep=" ")
+
+    seconds = rng.integers(0, days * 86_400, size=n)
+    timestamps = pd.Timestamp(start) + pd.to_timedelta(np.sort(seconds), unit="s")
+    return pd.DataFrame({"timestamp": timestamps, "review_text": text, "predicted_label": labels})
+
+
+def synthetic_csv(path, n, **kwargs):
+    """Writes synthetic reviews as an upload CSV with 'Time_Stamp' and 'Description' columns."""
+    df = synthetic_reviews(n, **kwargs)
+    df.rename(columns={"timestamp": "Time_Stamp", "review_text": "Description"})[["Time_Stamp", "Description"]] \
+        .to_csv(path, index=False)
+    return path
@@ -1,53 +1,25 @@
+import numpy as np
 import pandas as pd
-import plotly.express as px
-from collections import Counter
-import re
-import ssl
-
-try:
-    _create_unverified_https_context = ssl._create_unverified_context
-except AttributeError:
-    pass
-else:
-    ssl._create_default_https_context = _create_unverified_https_context
-
-# --- Add necessary NLTK imports and setup ---
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-
-# Ensure NLTK data is available
-try:
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/wordnet')
-    nltk.data.find('corpora/punkt_tab')
-except LookupError:
-    nltk.download('stopwords')
-    nltk.download('punkt')
-    nltk.download('punkt_tab')
-    nltk.download('wordnet')
-
-# --- Internal preprocessing function (currently unused but kept for potential future use) ---
-# def _preprocess_for_word_count(text):
-#     """A private preprocessing function for the dashboard's use."""
-#     lemmatizer = WordNetLemmatizer()
-#     stop_words = set(stopwords.words('english'))
-    
-#     text = re.sub(r'[^a-zA-Z\s]', '', text, re.I|re.A)
-#     text = text.lower()
-#     tokens = word_tokenize(text)
-#     processed_tokens = [lemmatizer.lemmatize(word) for word in tokens if word not in stop_words and len(word) > 1]
-#     return " ".join(processed_tokens)
+
+import metrics
+
+# plotly.express is imported inside the plotting functions: it is one of the
+# slowest imports in the app and is only needed once a chart is drawn.
 
 
 def create_sentiment_distribution_plot(df):
     """Creates an interactive bar chart of sentiment counts with improved aesthetics."""
-    sentiment_counts = df['predicted_label'].value_counts().reset_index()
-    sentiment_counts.columns = ['Sentiment', 'Count']
+    return create_sentiment_counts_plot(df['predicted_label'].value_counts().to_dict())
+
+
+@metrics.timed("plot.sentiment_counts")
+def create_sentiment_counts_plot(label_counts):
+    """Same chart as create_sentiment_distribution_plot, from a {predicted_label: count} mapping."""
+    sentiment_counts = pd.DataFrame(list(label_counts.items()), columns=['Sentiment', 'Count'])
     sentiment_counts['Sentiment'] = sentiment_counts['Sentiment'].map({1: 'Happy', 0: 'Not Happy', -1: 'Error'})
     
+    import plotly.express as px
+
     fig = px.bar(sentiment_counts, 
                  x='Sentiment', 
                  y='Count',
@@ -80,28 +52,124 @@ def create_sentiment_distribution_plot(df):
 #     # ... (function logic)
 
 
+@metrics.timed("plot.time_series")
 def create_time_series_plot(df):
     """Creates an interactive time-series plot of sentiment counts per day with improved aesthetics."""
     if df.empty or 'timestamp' not in df.columns or df['timestamp'].isnull().all():
         return None
 
-    df['date'] = pd.to_datetime(df['timestamp'], errors='coerce').dt.date
-    df.dropna(subset=['date'], inplace=True)
+    # Truncate to days on the datetime64 values; the result is a new frame, so a cached df is left untouched.
+    days = pd.to_datetime(df['timestamp'], errors='coerce').to_numpy().astype('datetime64[D]')
+    daily = pd.DataFrame({'date': days, 'predicted_label': df['predicted_label'].to_numpy()}).dropna(subset=['date'])
+
+    if daily.empty:
+        return None
+
+    daily_counts = daily.groupby(['date', 'predicted_label']).size().reset_index(name='count')
+    return create_daily_trend_plot(daily_counts)
+
+
+# --- Trend resolution ---
+TREND_MAX_POINTS = 400  # per sentiment line; longer series are bucketed coarser, then downsampled
+TREND_MARKER_LIMIT = 120  # per sentiment line; above this markers are dropped and only lines drawn
+_BUCKET_DAYS = {'day': 1, 'week': 7, 'month': 30.44}
+_BUCKET_TITLES = {'day': "Daily", 'week': "Weekly", 'month': "Monthly"}
+
 
-    if df.empty:
+def choose_trend_bucket(first_day, last_day, max_points=TREND_MAX_POINTS):
+    """Returns the finest of 'day', 'week' or 'month' that keeps the range within max_points buckets."""
+    span_days = (pd.Timestamp(last_day) - pd.Timestamp(first_day)).days + 1
+    for bucket, days in _BUCKET_DAYS.items():
+        if span_days / days <= max_points:
+            return bucket
+    return 'month'
+
+
+def bucket_trend_counts(daily_counts, bucket):
+    """
+    Sums 'date' / 'predicted_label' / 'count' rows into week (starting Monday)
+    or month buckets, truncating the dates as datetime64 arrays.
+    """
+    days = pd.to_datetime(daily_counts['date']).to_numpy().astype('datetime64[D]')
+    if bucket == 'week':
+        # 1970-01-01 was a Thursday, so (days since epoch + 3) % 7 is the offset from Monday.
+        days = days - (days.astype('int64') + 3) % 7
+    elif bucket == 'month':
+        days = days.astype('datetime64[M]').astype('datetime64[D]')
+    bucketed = pd.DataFrame({'date': days, 'predicted_label': daily_counts['predicted_label'].to_numpy(),
+                             'count': daily_counts['count'].to_numpy()})
+    return bucketed.groupby(['date', 'predicted_label'], as_index=False)['count'].sum()
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling: returns the indices of at most
+    threshold points of (x, y) that best preserve the shape of the line. The
+    first and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Pick the point forming the largest triangle with the previous pick and the next bucket's average.
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(areas.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample_trend_counts(trend_counts, max_points=TREND_MAX_POINTS):
+    """Applies LTTB to each sentiment's line separately, keeping at most max_points points per line."""
+    lines = []
+    for _, line in trend_counts.groupby('predicted_label', sort=False):
+        line = line.sort_values('date')
+        x = line['date'].to_numpy().astype('datetime64[D]').astype('int64')
+        lines.append(line.iloc[lttb_indices(x, line['count'].to_numpy(), max_points)])
+    return pd.concat(lines, ignore_index=True) if lines else trend_counts
+
+
+@metrics.timed("plot.daily_trend")
+def create_daily_trend_plot(daily_counts, max_points=TREND_MAX_POINTS, downsample=True):
+    """
+    Same chart as create_time_series_plot, from pre-aggregated counts with
+    'date', 'predicted_label' and 'count' columns (e.g. the daily_sentiment rollup).
+
+    Long ranges are bucketed by week or month so each line has at most
+    max_points points; if that is still too many and downsample is set, LTTB
+    reduces each line to max_points. Markers are only drawn on short lines.
+    """
+    if daily_counts is None or daily_counts.empty:
         return None
 
-    df['Sentiment'] = df['predicted_label'].map({1: 'Happy', 0: 'Not Happy'})
-    daily_counts = df.groupby(['date', 'Sentiment']).size().reset_index(name='Count')
+    bucket = choose_trend_bucket(daily_counts['date'].min(), daily_counts['date'].max(), max_points)
+    trend_counts = bucket_trend_counts(daily_counts, bucket) if bucket != 'day' else daily_counts
+    if downsample and trend_counts.groupby('predicted_label').size().max() > max_points:
+        trend_counts = downsample_trend_counts(trend_counts, max_points)
+    show_markers = trend_counts.groupby('predicted_label').size().max() <= TREND_MARKER_LIMIT
 
-    fig = px.line(daily_counts, 
+    trend_counts = trend_counts.assign(Sentiment=trend_counts['predicted_label'].map({1: 'Happy', 0: 'Not Happy'}))
+    trend_counts = trend_counts.dropna(subset=['Sentiment']).rename(columns={'count': 'Count'})
+
+    import plotly.express as px
+
+    fig = px.line(trend_counts, 
                   x='date', 
                   y='Count', 
                   color='Sentiment',
-                  title="Daily Sentiment Trend",
+                  title=f"{_BUCKET_TITLES[bucket]} Sentiment Trend",
                   labels={'date': 'Date', 'Count': 'Number of Reviews'},
                   color_discrete_map={'Happy': 'mediumseagreen', 'Not Happy': 'indianred'},
-                  markers=True,
+                  markers=show_markers,
                   template='plotly_white'
                  )
     
@@ -116,4 +184,4 @@ def create_time_series_plot(df):
     
     fig.update_traces(line=dict(width=2.5))
     
-    return fig
\ No newline at end of file
+    return fig
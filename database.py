@@ -1,123 +1,1530 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import date
+
 import streamlit as st
 import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.pool import PoolError
 import pandas as pd
 
-# The @st.cache_resource decorator has been removed from this function
-def get_db_connection():
-    """Establishes a connection to the remote Postgres database."""
+import metrics
+from text_processing import count_terms_by_label, review_terms
+
+# Connection pool sizing. Override with `pool_min`/`pool_max` under [database]
+# in Streamlit secrets, or with the DB_POOL_MIN/DB_POOL_MAX environment variables.
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 10
+POOL_CHECKOUT_TIMEOUT = 30  # seconds to wait for a free connection
+POOL_PING_AFTER_IDLE = 30  # seconds idle before a connection is pinged on checkout
+POOL_MAX_IDLE = 300  # seconds before connections above the minimum are closed
+
+_pool = None
+_pool_lock = threading.Lock()
+_schema_ready = False  # set once setup_database has succeeded in this process
+_schema_lock = threading.Lock()
+_partition_months = set()  # months known to have a reviews partition in this process
+_partition_lock = threading.Lock()
+_review_key_missing = False  # reviews lacks the (timestamp, review_hash) unique index; see _skip_stored_reviews
+_schema_warnings = []  # problems setup_database found that need an operator, repeated by ensure_database_ready
+
+
+def _report(message, level="error"):
+    """
+    Shows a message in the app. manage.py and worker.py call this module
+    outside `streamlit run`, where st.error draws nothing, so there the
+    message goes to stderr instead.
+    """
+    if st.runtime.exists():
+        getattr(st, level)(message)
+    else:
+        print(message, file=sys.stderr)
+
+
+def _database_setting(key, env_var, default=None):
+    """Reads a [database] setting from the environment first, then from Streamlit secrets."""
+    value = os.environ.get(env_var)
+    if value:
+        return value
     try:
-        # CORRECTED: Extract the single connection string from secrets
-        connection_string = st.secrets["database"]["db_url"]
-        # Pass the connection string as a single argument
-        conn = psycopg2.connect(connection_string)
+        return st.secrets["database"][key]
+    except (KeyError, FileNotFoundError):
+        return default
+
+
+class ConnectionPool:
+    """
+    A process-wide, thread-safe Postgres connection pool shared by every
+    Streamlit session. Checkouts block (up to a timeout) when all connections
+    are busy, and idle connections are health-checked before being handed out.
+    """
+
+    def __init__(self, dsn, minconn, maxconn):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self._dsn = dsn
+        self._idle = deque()  # (connection, last used) pairs, most recently used last
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._open = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        with metrics.timed("db.connect"):
+            conn = psycopg2.connect(self._dsn)
+        with self._lock:
+            self._open += 1
         return conn
-    except psycopg2.OperationalError as e:
-        st.error(f"❌ Error connecting to the database: {e}")
-        st.info("Please check your database credentials in Streamlit secrets and ensure the database is running.")
-        return None
 
-def setup_database():
-    """Ensures the 'reviews' table exists in the database."""
-    conn = get_db_connection()
-    if conn:
+    def _close(self, conn):
         try:
-            with conn.cursor() as c:
-                c.execute('''
-                    CREATE TABLE IF NOT EXISTS reviews (
-                        id SERIAL PRIMARY KEY,
-                        timestamp TIMESTAMP,
-                        review_text TEXT,
-                        predicted_label INTEGER
-                    )
-                ''')
-            conn.commit()
-        except Exception as e:
-            st.error(f"Error during table setup: {e}")
-        finally:
             conn.close()
+        finally:
+            with self._lock:
+                self._open -= 1
 
-def insert_single_review(timestamp, review, label):
-    """Inserts a single review record into the database."""
-    conn = get_db_connection()
-    if conn:
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < POOL_PING_AFTER_IDLE:
+            return True
         try:
             with conn.cursor() as c:
-                c.execute(
-                    "INSERT INTO reviews (timestamp, review_text, predicted_label) VALUES (%s, %s, %s)",
-                    (timestamp, review, label)
-                )
-            conn.commit()
-        except Exception as e:
-            st.error(f"Error inserting single review: {e}")
+                c.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def checkout(self, timeout=POOL_CHECKOUT_TIMEOUT):
+        """Returns a healthy connection, waiting up to `timeout` seconds for one to be free."""
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolError(f"no database connection became free within {timeout}s")
+        try:
+            conn = None
+            while conn is None:
+                with self._lock:
+                    idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    conn = self._connect()
+                elif self._is_healthy(*idle):
+                    conn = idle[0]
+                else:
+                    self._close(idle[0])
+                    with self._lock:
+                        self._discarded += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.monotonic() - start
+        metrics.observe("db.checkout_wait", waited)
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def checkin(self, conn):
+        """Returns a connection to the pool, rolling back any open transaction."""
+        try:
+            if not conn.closed:
+                status = conn.info.transaction_status
+                if status == TRANSACTION_STATUS_UNKNOWN:
+                    conn.close()
+                elif status != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            if conn.closed:
+                with self._lock:
+                    self._open -= 1
+            else:
+                now = time.monotonic()
+                with self._lock:
+                    self._idle.append((conn, now))
+                    # Let the pool shrink back towards minconn once load drops.
+                    expired = []
+                    while len(self._idle) > self.minconn and now - self._idle[0][1] > POOL_MAX_IDLE:
+                        expired.append(self._idle.popleft()[0])
+                for stale in expired:
+                    self._close(stale)
         finally:
-            conn.close()
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
 
-def insert_bulk_reviews(df):
-    """Inserts a DataFrame of reviews into the database."""
-    conn = get_db_connection()
-    if conn:
+    def stats(self):
+        """Returns pool sizing and wait-time figures for display."""
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                "min_connections": self.minconn,
+                "max_connections": self.maxconn,
+                "open_connections": self._open,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "utilisation": self._in_use / self.maxconn,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "discarded_unhealthy": self._discarded,
+                "avg_wait_ms": 1000 * self._wait_total / checkouts if checkouts else 0.0,
+                "max_wait_ms": 1000 * self._wait_max,
+            }
+
+
+def get_connection_pool():
+    """Returns the process-wide connection pool, creating it on first use. Returns None if the database is unreachable."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                dsn = _database_setting("db_url", "DATABASE_URL")
+                if not dsn:
+                    _report("❌ No database connection string configured.")
+                    _report("Set db_url under [database] in Streamlit secrets, or the DATABASE_URL environment variable.", "info")
+                    return None
+                try:
+                    _pool = ConnectionPool(
+                        dsn,
+                        int(_database_setting("pool_min", "DB_POOL_MIN", POOL_MIN_CONNECTIONS)),
+                        int(_database_setting("pool_max", "DB_POOL_MAX", POOL_MAX_CONNECTIONS)),
+                    )
+                except psycopg2.OperationalError as e:
+                    _report(f"❌ Error connecting to the database: {e}")
+                    _report("Please check your database credentials in Streamlit secrets and ensure the database is running.", "info")
+    return _pool
+
+
+@contextmanager
+def db_connection():
+    """
+    Checks a pooled connection out for the duration of a with-block and
+    returns it afterwards. Yields None if no connection could be obtained.
+    """
+    pool = get_connection_pool()
+    conn = None
+    if pool:
         try:
+            conn = pool.checkout()
+        except (PoolError, psycopg2.OperationalError) as e:
+            _report(f"❌ Error connecting to the database: {e}")
+    try:
+        yield conn
+    finally:
+        if conn is not None:
+            pool.checkin(conn)
+
+
+def get_pool_stats():
+    """Returns the connection pool's utilisation and wait-time statistics, or None before it exists."""
+    return _pool.stats() if _pool else None
+
+# Advisory lock key held by setup_database, so the app and several workers starting
+# at once on a fresh database create the schema one after another instead of racing.
+SCHEMA_SETUP_LOCK = 5_118_203
+
+def setup_database():
+    """
+    Ensures the 'reviews' table and its supporting tables exist in the database.
+
+    Returns:
+        True if the schema is in place, False otherwise.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_SETUP_LOCK,))
+                    # New databases get the monthly partitioned layout; an existing unpartitioned
+                    # table keeps working until it is moved with `python manage.py migrate-partitions`.
+                    c.execute("SELECT to_regclass('reviews')")
+                    if c.fetchone()[0] is None:
+                        _create_partitioned_reviews(c)
+                    if _is_partitioned(c):
+                        today = date.today()
+                        _create_review_partitions(c, [_add_months(date(today.year, today.month, 1), ahead)
+                                                      for ahead in range(REVIEW_PARTITIONS_AHEAD + 1)])
+                    _migrate_review_dedup_key(c)
+                    _migrate_review_search_index(c)
+                    # Per-day sentiment counts for the dashboard, kept current by every insert.
+                    c.execute("SELECT to_regclass('daily_sentiment')")
+                    backfill_rollup = c.fetchone()[0] is None
+                    c.execute('''
+                        CREATE TABLE IF NOT EXISTS daily_sentiment (
+                            day DATE NOT NULL,
+                            predicted_label INTEGER NOT NULL,
+                            review_count BIGINT NOT NULL,
+                            PRIMARY KEY (day, predicted_label)
+                        )
+                    ''')
+                    if backfill_rollup:
+                        _rebuild_daily_sentiment(c)
+                    # Inverted index of lemmatized terms -> number of happy / not happy reviews containing them.
+                    c.execute("SELECT to_regclass('aspect_index')")
+                    backfill_aspects = c.fetchone()[0] is None
+                    c.execute('''
+                        CREATE TABLE IF NOT EXISTS aspect_index (
+                            term TEXT NOT NULL,
+                            predicted_label INTEGER NOT NULL,
+                            review_count BIGINT NOT NULL,
+                            PRIMARY KEY (term, predicted_label)
+                        )
+                    ''')
+                    if backfill_aspects:
+                        _rebuild_aspect_index(conn, c)
+                    # Progress of each uploaded CSV (keyed by a hash of its contents), for resuming.
+                    c.execute('''
+                        CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                            file_key TEXT PRIMARY KEY,
+                            file_name TEXT,
+                            rows_committed BIGINT NOT NULL DEFAULT 0,
+                            completed BOOLEAN NOT NULL DEFAULT FALSE,
+                            updated_at TIMESTAMP DEFAULT NOW()
+                        )
+                    ''')
+                    # Queued bulk uploads, processed by worker.py; the CSV travels with the job
+                    # and is cleared once the job is done, failed or cancelled.
+                    c.execute('''
+                        CREATE TABLE IF NOT EXISTS ingest_jobs (
+                            id BIGSERIAL PRIMARY KEY,
+                            file_key TEXT NOT NULL,
+                            file_name TEXT,
+                            csv_data BYTEA,
+                            total_rows BIGINT,
+                            restart BOOLEAN NOT NULL DEFAULT FALSE,
+                            status TEXT NOT NULL DEFAULT 'queued',
+                            rows_done BIGINT NOT NULL DEFAULT 0,
+                            attempts INTEGER NOT NULL DEFAULT 0,
+                            worker TEXT,
+                            summary JSONB,
+                            error TEXT,
+                            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                            started_at TIMESTAMP,
+                            heartbeat_at TIMESTAMP,
+                            finished_at TIMESTAMP
+                        )
+                    ''')
+                    c.execute("ALTER TABLE ingest_jobs ALTER COLUMN csv_data DROP NOT NULL")
+                    # Uncompressed out-of-line storage lets workers read the CSV piece by piece with substring().
+                    c.execute("ALTER TABLE ingest_jobs ALTER COLUMN csv_data SET STORAGE EXTERNAL")
+                    # At most one queued or running job per file, and a small index for workers looking for work.
+                    c.execute('''
+                        CREATE UNIQUE INDEX IF NOT EXISTS ingest_jobs_active_file_key
+                        ON ingest_jobs (file_key) WHERE status IN ('queued', 'running')
+                    ''')
+                    c.execute("CREATE INDEX IF NOT EXISTS ingest_jobs_queued_idx ON ingest_jobs (id) WHERE status = 'queued'")
+                    # Second-tier cache for model predictions, keyed by hash(model version + normalized text).
+                    c.execute('''
+                        CREATE TABLE IF NOT EXISTS prediction_cache (
+                            cache_key TEXT PRIMARY KEY,
+                            model_version TEXT NOT NULL,
+                            label TEXT NOT NULL,
+                            confidence DOUBLE PRECISION,
+                            created_at TIMESTAMP DEFAULT NOW()
+                        )
+                    ''')
+                conn.commit()
+                return True
+            except Exception as e:
+                _report(f"Error during table setup: {e}")
+    return False
+
+
+def ensure_database_ready():
+    """
+    Runs setup_database once per process. Streamlit reruns the app script on
+    every interaction; after the first successful setup this is a flag check.
+    A failed setup is retried on the next call, and warnings from a
+    successful one are shown again on every call until the process restarts.
+    """
+    global _schema_ready
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                _schema_ready = setup_database()
+                return _schema_ready
+    for warning in _schema_warnings:
+        _report(warning, "warning")
+    return _schema_ready
+
+# A review with the same timestamp and text as an older row (lower id) of the reviews table.
+_DUPLICATE_REVIEW_SQL = '''
+    EXISTS (
+        SELECT 1 FROM reviews older
+        WHERE older.timestamp = reviews.timestamp
+          AND older.review_hash = reviews.review_hash
+          AND older.id < reviews.id
+    )
+'''
+
+def _migrate_review_dedup_key(c):
+    """
+    Adds the content-hash column and the (timestamp, review_hash) unique index
+    that bulk loads use to skip reviews already in the table. If the table
+    already holds exact duplicates (same timestamp and text) the index is not
+    created; they are left alone for `python manage.py dedupe-reviews`, and
+    inserts check for stored reviews without the index meanwhile.
+    """
+    global _review_key_missing
+    c.execute("ALTER TABLE reviews ADD COLUMN IF NOT EXISTS review_hash TEXT "
+              "GENERATED ALWAYS AS (md5(coalesce(review_text, ''))) STORED")
+    c.execute("SELECT to_regclass('reviews_timestamp_review_hash_key')")
+    if c.fetchone()[0] is None:
+        c.execute(f"SELECT COUNT(*) FROM reviews WHERE {_DUPLICATE_REVIEW_SQL}")
+        duplicates = c.fetchone()[0]
+        if duplicates:
+            warning = (f"reviews holds {duplicates} duplicate reviews (same timestamp and text), so the index "
+                       "that lets uploads skip known reviews quickly was not created and uploads are slower. "
+                       "Run 'python manage.py dedupe-reviews' to remove them.")
+            _report(warning, "warning")
+            _schema_warnings[:] = [warning]
+            _review_key_missing = True
+            return
+        c.execute("CREATE UNIQUE INDEX reviews_timestamp_review_hash_key ON reviews (timestamp, review_hash)")
+    _review_key_missing = False
+    _schema_warnings[:] = []
+
+def _skip_stored_reviews(source):
+    """
+    The clause ending an `INSERT INTO reviews ... SELECT ... FROM source` that
+    skips reviews already stored. Without the unique index (a table with
+    duplicates awaiting dedupe-reviews) ON CONFLICT has nothing to match, so
+    stored reviews are looked up instead; duplicates within one upload then get through.
+    """
+    if _review_key_missing:
+        return f'''
+            WHERE NOT EXISTS (
+                SELECT 1 FROM reviews r
+                WHERE r.timestamp = {source}.timestamp AND r.review_hash = md5(coalesce({source}.review_text, ''))
+            )
+            ON CONFLICT DO NOTHING
+        '''
+    return "ON CONFLICT (timestamp, review_hash) DO NOTHING"
+
+# Appended to an "inserted AS (INSERT INTO reviews ... RETURNING timestamp, predicted_label)"
+# CTE so the daily rollup is updated in the same statement as the rows it counts.
+# ORDER BY keeps lock order consistent between concurrent loads.
+_DAILY_ROLLUP_CTE = '''
+    rollup AS (
+        INSERT INTO daily_sentiment (day, predicted_label, review_count)
+        SELECT timestamp::date, predicted_label, COUNT(*)
+        FROM inserted
+        WHERE timestamp IS NOT NULL AND predicted_label IS NOT NULL
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (day, predicted_label)
+        DO UPDATE SET review_count = daily_sentiment.review_count + EXCLUDED.review_count
+    )
+'''
+
+def _rebuild_daily_sentiment(c):
+    """Recomputes daily_sentiment from reviews, blocking review inserts while it runs."""
+    c.execute("LOCK TABLE reviews IN SHARE MODE")
+    c.execute("TRUNCATE daily_sentiment")
+    c.execute('''
+        INSERT INTO daily_sentiment (day, predicted_label, review_count)
+        SELECT timestamp::date, predicted_label, COUNT(*)
+        FROM reviews
+        WHERE timestamp IS NOT NULL AND predicted_label IS NOT NULL
+        GROUP BY 1, 2
+    ''')
+
+ASPECT_BACKFILL_BATCH_ROWS = 20_000  # reviews streamed and preprocessed at a time during a rebuild
+
+def _update_aspect_index(c, term_counts):
+    """Adds a Counter of (term, label) -> review count to the aspect index."""
+    if not term_counts:
+        return
+    # Sorted so concurrent loads lock index rows in the same order.
+    rows = sorted((term, label, count) for (term, label), count in term_counts.items())
+    from psycopg2.extras import execute_values
+    with metrics.timed("db.aspect_index_update") as stage:
+        execute_values(
+            c,
+            '''
+            INSERT INTO aspect_index (term, predicted_label, review_count) VALUES %s
+            ON CONFLICT (term, predicted_label)
+            DO UPDATE SET review_count = aspect_index.review_count + EXCLUDED.review_count
+            ''',
+            rows,
+            page_size=1000
+        )
+        stage.rows = len(rows)
+
+def _rebuild_aspect_index(conn, c, progress_callback=None):
+    """
+    Recomputes aspect_index from reviews, streaming them through a server-side
+    cursor so memory stays bounded. Blocks review inserts while it runs.
+    """
+    c.execute("LOCK TABLE reviews IN SHARE MODE")
+    c.execute("TRUNCATE aspect_index")
+    term_counts = Counter()
+    done = 0
+    with conn.cursor(name="aspect_index_backfill") as reader:
+        reader.itersize = ASPECT_BACKFILL_BATCH_ROWS
+        reader.execute("SELECT review_text, predicted_label FROM reviews WHERE predicted_label IS NOT NULL")
+        while True:
+            batch = reader.fetchmany(ASPECT_BACKFILL_BATCH_ROWS)
+            if not batch:
+                break
+            texts, labels = zip(*batch)
+            term_counts.update(count_terms_by_label(texts, labels))
+            done += len(batch)
+            if progress_callback:
+                progress_callback(done)
+    _update_aspect_index(c, term_counts)
+    return len(term_counts)
+
+def rebuild_aspect_index(progress_callback=None):
+    """
+    Recomputes the lemmatized aspect index from the full reviews table.
+
+    Args:
+        progress_callback: Optional callable(reviews_processed).
+
+    Returns:
+        The number of (term, label) entries written, or None on error.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    entries = _rebuild_aspect_index(conn, c, progress_callback)
+                conn.commit()
+                return entries
+            except Exception as e:
+                _report(f"Failed to rebuild the aspect index: {e}")
+    return None
+
+def rebuild_daily_sentiment():
+    """
+    Recomputes the daily sentiment rollup from the full reviews table.
+
+    Returns:
+        The number of (day, label) rows written, or None on error.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    _rebuild_daily_sentiment(c)
+                    rows = c.rowcount
+                conn.commit()
+                return rows
+            except Exception as e:
+                _report(f"Failed to rebuild the daily sentiment rollup: {e}")
+    return None
+
+def _migrate_review_search_index(c):
+    """
+    Adds a stemmed full-text column over review_text with a GIN index, so
+    aspect searches match whole (stemmed) words through the index instead of
+    scanning every review with ILIKE.
+    """
+    c.execute("ALTER TABLE reviews ADD COLUMN IF NOT EXISTS review_tsv tsvector "
+              "GENERATED ALWAYS AS (to_tsvector('english', coalesce(review_text, ''))) STORED")
+    c.execute("CREATE INDEX IF NOT EXISTS reviews_review_tsv_idx ON reviews USING GIN (review_tsv)")
+
+# --- Monthly partitions of reviews ---
+REVIEW_PARTITIONS_AHEAD = 1  # months after the current one that setup_database creates partitions for
+REVIEW_DEFAULT_PARTITION = 'reviews_default'
+
+# (name suffix, definition) of the indexes on the partitioned reviews table.
+_REVIEW_INDEXES = [
+    ("timestamp_review_hash_key", "CREATE UNIQUE INDEX {name} ON {table} (timestamp, review_hash)"),
+    ("review_tsv_idx", "CREATE INDEX {name} ON {table} USING GIN (review_tsv)"),
+    ("timestamp_brin", "CREATE INDEX {name} ON {table} USING BRIN (timestamp)"),
+]
+
+def _create_partitioned_reviews(c, table='reviews'):
+    """
+    Creates 'reviews' range-partitioned by month on timestamp. Unique keys on a
+    partitioned table must include the partition key, so the primary key is
+    (id, timestamp) and timestamp is NOT NULL. A BRIN index on timestamp
+    narrows range scans within a month, and the default partition catches rows
+    for months that have no partition yet.
+
+    The migration builds the table under another name first; its indexes and
+    sequence are then named after that table until they are renamed.
+    """
+    c.execute(f'''
+        CREATE TABLE {table} (
+            id BIGSERIAL,
+            timestamp TIMESTAMP NOT NULL,
+            review_text TEXT,
+            predicted_label INTEGER,
+            review_hash TEXT GENERATED ALWAYS AS (md5(coalesce(review_text, ''))) STORED,
+            review_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(review_text, ''))) STORED,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    ''')
+    for suffix, definition in _REVIEW_INDEXES:
+        c.execute(definition.format(name=f"{table}_{suffix}", table=table))
+    c.execute(f"CREATE TABLE {REVIEW_DEFAULT_PARTITION} PARTITION OF {table} DEFAULT")
+
+def _is_partitioned(c):
+    c.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('reviews')")
+    row = c.fetchone()
+    return bool(row and row[0])
+
+def _add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+def _partition_name(month):
+    return f"reviews_p{month:%Y_%m}"
+
+def _months_of(timestamps):
+    """Returns the set of months (as first-of-month dates) that a collection of timestamps falls in."""
+    months = pd.to_datetime(pd.Series(timestamps), errors='coerce').dropna().dt.to_period('M').unique()
+    return {date(month.year, month.month, 1) for month in months}
+
+def _create_review_partitions(c, months, parent='reviews'):
+    """
+    Creates the missing partitions of `parent` for a list of months
+    (first-of-month dates), without committing. Rows of those months already sitting in the
+    default partition are moved into the new partition, since Postgres
+    refuses to add a partition whose rows are in the default one.
+    """
+    # Serializes concurrent creators; released when the caller's transaction ends.
+    c.execute("SELECT pg_advisory_xact_lock(hashtext('reviews_partitions'))")
+    for month in sorted(set(months)):
+        name, upper = _partition_name(month), _add_months(month, 1)
+        c.execute("SELECT to_regclass(%s)", (name,))
+        if c.fetchone()[0] is not None:
+            continue
+        c.execute(f"SELECT EXISTS (SELECT 1 FROM {REVIEW_DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s)",
+                  (month, upper))
+        if not c.fetchone()[0]:
+            c.execute(f"CREATE TABLE {name} PARTITION OF {parent} FOR VALUES FROM (%s) TO (%s)", (month, upper))
+            continue
+        c.execute(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING GENERATED)")
+        c.execute(f'''
+            WITH moved AS (
+                DELETE FROM {REVIEW_DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s
+                RETURNING id, timestamp, review_text, predicted_label
+            )
+            INSERT INTO {name} (id, timestamp, review_text, predicted_label) SELECT * FROM moved
+        ''', (month, upper))
+        c.execute(f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (month, upper))
+
+def ensure_review_partitions(timestamps):
+    """
+    Makes sure every month that the given timestamps fall in has a partition,
+    before rows for them are inserted. Postgres does not create partitions on
+    its own, and adding one locks the whole table, so this runs in its own
+    short transaction rather than inside the load. Months already seen by
+    this process are skipped without a query. Does nothing for an
+    unpartitioned reviews table.
+
+    Returns:
+        True if the partitions are in place (or not needed), False on error.
+        Rows for a month without a partition still land in the default partition.
+    """
+    with _partition_lock:
+        missing = _months_of(timestamps) - _partition_months
+    if not missing:
+        return True
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    if _is_partitioned(c):
+                        _create_review_partitions(c, missing)
+                        remember = True
+                    else:
+                        remember = False  # re-checked next time, in case the table is migrated meanwhile
+                conn.commit()
+                if remember:
+                    with _partition_lock:
+                        _partition_months.update(missing)
+                return True
+            except Exception as e:
+                _report(f"Failed to create partitions for new reviews: {e}")
+    return False
+
+def list_review_partitions():
+    """
+    Returns a list of (partition name, month or None for the default
+    partition, estimated rows, bytes on disk), in month order, or None on
+    error. Empty for an unpartitioned reviews table.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    if not _is_partitioned(c):
+                        return []
+                    c.execute('''
+                        SELECT child.relname, GREATEST(child.reltuples, 0)::bigint, pg_total_relation_size(child.oid)
+                        FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                        WHERE pg_inherits.inhparent = 'reviews'::regclass
+                        ORDER BY child.relname
+                    ''')
+                    rows = c.fetchall()
+                partitions = []
+                for name, estimated_rows, size in rows:
+                    month = None if name == REVIEW_DEFAULT_PARTITION else date(int(name[9:13]), int(name[14:16]), 1)
+                    partitions.append((name, month, estimated_rows, size))
+                return sorted(partitions, key=lambda p: (p[1] is None, p[1] or date.min))
+            except Exception as e:
+                _report(f"Failed to list the review partitions: {e}")
+    return None
+
+def migrate_reviews_to_partitioned():
+    """
+    Moves an unpartitioned 'reviews' table into the monthly partitioned
+    layout in a single transaction. The partitioned table, a partition for
+    every month present and its indexes are built and filled under the name
+    reviews_partitioned while the old table is only locked against writes,
+    so reads continue during the copy. The old table is then dropped and the
+    new one renamed into place, which blocks reads only for that final swap.
+    The daily rollup and the aspect index are unaffected.
+
+    Returns:
+        The number of reviews moved (0 if the table was already partitioned),
+        or None on error.
+    """
+    staging = 'reviews_partitioned'
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    if _is_partitioned(c):
+                        return 0
+                    # EXCLUSIVE blocks inserts and updates but not SELECTs.
+                    c.execute("LOCK TABLE reviews IN EXCLUSIVE MODE")
+                    c.execute("SELECT COUNT(*) FROM reviews WHERE timestamp IS NULL")
+                    missing_timestamps = c.fetchone()[0]
+                    if missing_timestamps:
+                        raise ValueError(f"{missing_timestamps} reviews have no timestamp, which the partitioned "
+                                         "table requires. Delete them or set their timestamp, then migrate again.")
+
+                    _create_partitioned_reviews(c, staging)
+                    c.execute("SELECT DISTINCT date_trunc('month', timestamp)::date FROM reviews")
+                    _create_review_partitions(c, [month for (month,) in c.fetchall()], parent=staging)
+                    c.execute(f'''
+                        INSERT INTO {staging} (id, timestamp, review_text, predicted_label)
+                        SELECT id, timestamp, review_text, predicted_label FROM reviews
+                    ''')
+                    moved = c.rowcount
+                    c.execute(f"SELECT setval(pg_get_serial_sequence('{staging}', 'id'), "
+                              f"COALESCE((SELECT MAX(id) FROM {staging}), 0) + 1, false)")
+
+                    # The swap: dropping the old table (and its sequence) takes the lock that blocks readers.
+                    c.execute("DROP TABLE reviews")
+                    c.execute(f"ALTER TABLE {staging} RENAME TO reviews")
+                    for suffix in ['pkey'] + [suffix for suffix, _ in _REVIEW_INDEXES]:
+                        c.execute(f"ALTER INDEX {staging}_{suffix} RENAME TO reviews_{suffix}")
+                    c.execute(f"ALTER SEQUENCE {staging}_id_seq RENAME TO reviews_id_seq")
+                conn.commit()
+                with _partition_lock:
+                    _partition_months.clear()
+                return moved
+            except Exception as e:
+                _report(f"Failed to migrate reviews to the partitioned layout: {e}")
+    return None
+
+def _subtract_from_rollups(conn, c, table, where_sql, params):
+    """
+    Removes the reviews in `table` matching `where_sql` from the daily
+    sentiment rollup and the aspect index, before the caller deletes them.
+    """
+    with metrics.timed("db.retention_rollups"):
+        c.execute(f'''
+            WITH gone AS (
+                SELECT timestamp::date AS day, predicted_label, COUNT(*) AS n
+                FROM {table}
+                WHERE {where_sql} AND timestamp IS NOT NULL AND predicted_label IS NOT NULL
+                GROUP BY 1, 2
+            )
+            UPDATE daily_sentiment d SET review_count = d.review_count - gone.n
+            FROM gone WHERE d.day = gone.day AND d.predicted_label = gone.predicted_label
+        ''', params)
+        c.execute("DELETE FROM daily_sentiment WHERE review_count <= 0")
+
+        term_counts = Counter()
+        with conn.cursor(name="retention_terms") as reader:
+            reader.itersize = ASPECT_BACKFILL_BATCH_ROWS
+            reader.execute(f"SELECT review_text, predicted_label FROM {table} WHERE {where_sql} AND predicted_label IS NOT NULL",
+                           params)
+            while True:
+                batch = reader.fetchmany(ASPECT_BACKFILL_BATCH_ROWS)
+                if not batch:
+                    break
+                texts, labels = zip(*batch)
+                term_counts.update(count_terms_by_label(texts, labels))
+        _update_aspect_index(c, Counter({key: -count for key, count in term_counts.items()}))
+        c.execute("DELETE FROM aspect_index WHERE review_count <= 0")
+
+def drop_reviews_before(cutoff, progress_callback=None):
+    """
+    Deletes every review older than the first day of the month containing
+    `cutoff`. With the partitioned layout, each whole month is dropped as a
+    partition (one transaction per month, so no long table lock), and only
+    stray rows in the default partition are deleted row by row. An
+    unpartitioned table falls back to a DELETE. The daily rollup and the
+    aspect index are corrected in the same transactions.
+
+    Args:
+        cutoff: A date; reviews before its month are removed.
+        progress_callback: Optional callable(description) after each step.
+
+    Returns:
+        A dict with 'partitions_dropped' and 'rows_deleted', or None on error.
+    """
+    cutoff = date(cutoff.year, cutoff.month, 1)
+    partitions = list_review_partitions()
+    if partitions is None:
+        return None
+    result = {"partitions_dropped": 0, "rows_deleted": 0}
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    partitioned = _is_partitioned(c)
+                conn.rollback()
+                if partitioned:
+                    for name, month, _, _ in partitions:
+                        if month is None or month >= cutoff:
+                            continue
+                        with conn.cursor() as c:
+                            # Block inserts into this month while its rows are counted, then drop it.
+                            c.execute(f"LOCK TABLE {name} IN SHARE MODE")
+                            c.execute(f"SELECT COUNT(*) FROM {name}")
+                            rows = c.fetchone()[0]
+                            _subtract_from_rollups(conn, c, name, "TRUE", ())
+                            with metrics.timed("db.retention_drop_partition") as stage:
+                                c.execute(f"DROP TABLE {name}")
+                                stage.rows = rows
+                        conn.commit()
+                        with _partition_lock:
+                            _partition_months.discard(month)
+                        result["partitions_dropped"] += 1
+                        result["rows_deleted"] += rows
+                        if progress_callback:
+                            progress_callback(f"dropped {name} ({rows} reviews)")
+
+                table = REVIEW_DEFAULT_PARTITION if partitioned else "reviews"
+                with conn.cursor() as c:
+                    c.execute(f"LOCK TABLE {table} IN SHARE MODE")
+                    _subtract_from_rollups(conn, c, table, "timestamp < %s", (cutoff,))
+                    with metrics.timed("db.retention_delete") as stage:
+                        c.execute(f"DELETE FROM {table} WHERE timestamp < %s", (cutoff,))
+                        rows = stage.rows = c.rowcount
+                conn.commit()
+                result["rows_deleted"] += rows
+                if progress_callback:
+                    progress_callback(f"deleted {rows} reviews from {table}")
+                return result
+            except Exception as e:
+                _report(f"Failed to delete old reviews: {e}")
+    return None
+
+def dedupe_reviews():
+    """
+    Deletes reviews that repeat an older review's timestamp and text, keeping
+    the oldest row, corrects the daily rollup and the aspect index, and creates
+    the (timestamp, review_hash) unique index that setup_database skipped.
+    Writes to reviews are blocked meanwhile; reads are not.
+
+    Returns:
+        The number of reviews deleted, or None on error.
+    """
+    global _review_key_missing
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute("LOCK TABLE reviews IN SHARE ROW EXCLUSIVE MODE")
+                    _subtract_from_rollups(conn, c, "reviews", _DUPLICATE_REVIEW_SQL, ())
+                    c.execute(f"DELETE FROM reviews WHERE {_DUPLICATE_REVIEW_SQL}")
+                    deleted = c.rowcount
+                    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS reviews_timestamp_review_hash_key "
+                              "ON reviews (timestamp, review_hash)")
+                conn.commit()
+                _review_key_missing = False
+                _schema_warnings[:] = []
+                return deleted
+            except Exception as e:
+                _report(f"Failed to remove duplicate reviews: {e}")
+    return None
+
+def insert_single_review(timestamp, review, label):
+    """Inserts a single review record into the database."""
+    ensure_review_partitions([timestamp])
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute(
+                        '''
+                        WITH inserted AS (
+                            INSERT INTO reviews (timestamp, review_text, predicted_label)
+                            SELECT * FROM (VALUES (%s::timestamp, %s::text, %s::integer))
+                                AS v (timestamp, review_text, predicted_label)
+                            ''' + _skip_stored_reviews("v") + '''
+                            RETURNING timestamp, predicted_label
+                        ),
+                        aspects AS (
+                            INSERT INTO aspect_index (term, predicted_label, review_count)
+                            SELECT term, predicted_label, 1
+                            FROM inserted, unnest(%s::text[]) AS term
+                            WHERE predicted_label IS NOT NULL
+                            ON CONFLICT (term, predicted_label)
+                            DO UPDATE SET review_count = aspect_index.review_count + EXCLUDED.review_count
+                        ),
+                        ''' + _DAILY_ROLLUP_CTE + "SELECT COUNT(*) FROM inserted",
+                        (timestamp, review, label, sorted(review_terms(review)) if isinstance(review, str) else [])
+                    )
+                conn.commit()
+            except Exception as e:
+                _report(f"Error inserting single review: {e}")
+
+REVIEW_COLUMNS = ['timestamp', 'review_text', 'predicted_label']
+COPY_BATCH_ROWS = 50_000  # rows serialized per COPY command, bounding the CSV buffer
+
+def _insert_reviews(c, df):
+    """
+    Loads a DataFrame of reviews using an open cursor, without committing.
+
+    Rows are streamed with COPY into a temporary staging table and merged into
+    'reviews' with ON CONFLICT DO NOTHING, so a review that is already stored
+    (same timestamp and text) is skipped instead of duplicated. The daily
+    sentiment rollup and the aspect index are updated for the rows actually inserted.
+
+    Returns:
+        A (inserted, skipped) tuple of row counts.
+    """
+    c.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS reviews_staging (
+            row_no BIGINT,
+            timestamp TIMESTAMP,
+            review_text TEXT,
+            predicted_label INTEGER
+        ) ON COMMIT DELETE ROWS
+    ''')
+
+    rows = df[REVIEW_COLUMNS].reset_index(drop=True)
+    for start in range(0, len(rows), COPY_BATCH_ROWS):
+        buffer = io.StringIO()
+        # The RangeIndex is written as row_no, to map staged rows back to the DataFrame.
+        rows.iloc[start:start + COPY_BATCH_ROWS].to_csv(buffer, header=False, index=True)
+        buffer.seek(0)
+        c.copy_expert("COPY reviews_staging (row_no, timestamp, review_text, predicted_label) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    c.execute('''
+        WITH inserted AS (
+            INSERT INTO reviews (timestamp, review_text, predicted_label)
+            SELECT timestamp, review_text, predicted_label FROM reviews_staging
+            ''' + _skip_stored_reviews("reviews_staging") + '''
+            RETURNING timestamp, predicted_label
+        ),
+    ''' + _DAILY_ROLLUP_CTE + "SELECT COUNT(*) FROM inserted")
+    inserted = c.fetchone()[0]
+
+    if inserted < len(rows):
+        # Some rows were skipped: find the staged rows this transaction actually inserted.
+        c.execute('''
+            SELECT DISTINCT ON (r.id) s.row_no
+            FROM reviews_staging s
+            JOIN reviews r ON r.timestamp = s.timestamp AND r.review_hash = md5(coalesce(s.review_text, ''))
+            WHERE r.xmin = pg_current_xact_id()::xid
+            ORDER BY r.id, s.row_no
+        ''')
+        rows = rows.iloc[sorted(row_no for (row_no,) in c.fetchall())]
+    _update_aspect_index(c, count_terms_by_label(rows['review_text'], rows['predicted_label']))
+    return inserted, len(df) - inserted
+
+def insert_bulk_reviews(df):
+    """
+    Inserts a DataFrame of reviews into the database, skipping reviews that are already stored.
+
+    Returns:
+        A dict with 'inserted', 'skipped' and 'rows_per_sec', or None on error.
+    """
+    ensure_review_partitions(df['timestamp'])
+    with db_connection() as conn:
+        if conn:
+            try:
+                start = time.perf_counter()
+                with conn.cursor() as c, metrics.timed("db.insert_reviews") as stage:
+                    inserted, skipped = _insert_reviews(c, df)
+                    stage.rows = len(df)
+                conn.commit()
+                elapsed = time.perf_counter() - start
+                return {"inserted": inserted, "skipped": skipped, "rows_per_sec": len(df) / elapsed if elapsed else 0.0}
+            except Exception as e:
+                _report(f"Error during bulk insert: {e}")
+    return None
+
+# --- Checkpoints for resumable CSV ingestion ---
+def get_ingest_checkpoint(file_key):
+    """
+    Returns the checkpoint for an uploaded file as a dict with 'rows_committed'
+    and 'completed', or None if the file has not been ingested before.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute("SELECT rows_committed, completed FROM ingest_checkpoints WHERE file_key = %s", (file_key,))
+                    row = c.fetchone()
+                    if row:
+                        return {"rows_committed": row[0], "completed": row[1]}
+            except Exception as e:
+                _report(f"Failed to read the upload checkpoint: {e}")
+    return None
+
+def commit_ingest_chunk(file_key, file_name, rows_committed, df, completed=False):
+    """
+    Inserts one chunk of reviews and advances the file's checkpoint to
+    `rows_committed` CSV rows in the same transaction, so a crash never
+    leaves rows saved without the checkpoint that covers them.
+
+    Returns:
+        A dict with the chunk's 'inserted' and 'skipped' row counts, or None if
+        the chunk could not be committed.
+    """
+    if not df.empty:
+        ensure_review_partitions(df['timestamp'])
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    with metrics.timed("db.insert_reviews") as stage:
+                        inserted, skipped = _insert_reviews(c, df) if not df.empty else (0, 0)
+                        stage.rows = len(df)
+                    c.execute(
+                        """
+                        INSERT INTO ingest_checkpoints (file_key, file_name, rows_committed, completed, updated_at)
+                        VALUES (%s, %s, %s, %s, NOW())
+                        ON CONFLICT (file_key) DO UPDATE SET
+                            rows_committed = EXCLUDED.rows_committed,
+                            completed = EXCLUDED.completed,
+                            updated_at = EXCLUDED.updated_at
+                        """,
+                        (file_key, file_name, rows_committed, completed)
+                    )
+                conn.commit()
+                return {"inserted": inserted, "skipped": skipped}
+            except Exception as e:
+                _report(f"Error while saving uploaded reviews: {e}")
+    return None
+
+def reset_ingest_checkpoint(file_key):
+    """Forgets a file's checkpoint so the next upload of it starts from the first row."""
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute("DELETE FROM ingest_checkpoints WHERE file_key = %s", (file_key,))
+                conn.commit()
+            except Exception as e:
+                _report(f"Failed to reset the upload checkpoint: {e}")
+
+# --- Background ingest jobs ---
+JOB_STALE_AFTER = 300  # seconds without a heartbeat before a running job is handed to another worker
+JOB_MAX_ATTEMPTS = 3  # claims per job before it is marked failed
+JOB_CSV_READ_BYTES = 4 * 2**20  # piece of a job's CSV fetched per query by a worker
+_JOB_STATUS_COLUMNS = (
+    "id, file_key, file_name, total_rows, status, rows_done, attempts, worker, summary, error, "
+    "created_at, started_at, heartbeat_at, finished_at, "
+    "EXTRACT(EPOCH FROM NOW() - created_at)::float8 AS age_s"  # by the database clock, like created_at
+)
+
+def enqueue_ingest_job(file_key, file_name, csv_data, total_rows=None, restart=False):
+    """
+    Queues an uploaded CSV for processing by a worker. If the same file is
+    already queued or running, that job is returned instead of a new one.
+
+    Returns:
+        The job id, or None on error.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute(
+                        """
+                        INSERT INTO ingest_jobs (file_key, file_name, csv_data, total_rows, restart)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT (file_key) WHERE status IN ('queued', 'running') DO NOTHING
+                        RETURNING id
+                        """,
+                        (file_key, file_name, psycopg2.Binary(csv_data), total_rows, restart)
+                    )
+                    row = c.fetchone()
+                    if row is None:
+                        c.execute("SELECT id FROM ingest_jobs WHERE file_key = %s AND status IN ('queued', 'running')", (file_key,))
+                        row = c.fetchone()
+                conn.commit()
+                return row[0] if row else None
+            except Exception as e:
+                _report(f"Failed to queue the upload: {e}")
+    return None
+
+def claim_ingest_job(worker_id, stale_after=JOB_STALE_AFTER, max_attempts=JOB_MAX_ATTEMPTS):
+    """
+    Claims the oldest queued job, or a running one whose worker stopped
+    sending heartbeats, for worker_id. FOR UPDATE SKIP LOCKED lets any number
+    of workers poll at once without claiming the same job or waiting on each other.
+
+    Returns:
+        A dict with the job's id, file_key, file_name, csv_bytes (the CSV's
+        size; read it with open_ingest_job_csv), total_rows, restart and
+        attempts, or None if there is nothing to do.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute(
+                        """
+                        UPDATE ingest_jobs SET status = 'failed', finished_at = NOW(), csv_data = NULL,
+                            error = 'The worker stopped responding too many times.'
+                        WHERE status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %s)
+                          AND attempts >= %s
+                        """,
+                        (stale_after, max_attempts)
+                    )
+                    c.execute(
+                        """
+                        UPDATE ingest_jobs SET status = 'running', worker = %(worker)s, attempts = attempts + 1,
+                            started_at = COALESCE(started_at, NOW()), heartbeat_at = NOW()
+                        WHERE id = (
+                            SELECT id FROM ingest_jobs
+                            WHERE status = 'queued'
+                               OR (status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %(stale)s))
+                            ORDER BY id
+                            LIMIT 1
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING id, file_key, file_name, octet_length(csv_data), total_rows, restart, attempts
+                        """,
+                        {"worker": worker_id, "stale": stale_after}
+                    )
+                    row = c.fetchone()
+                conn.commit()
+                if row:
+                    keys = ("id", "file_key", "file_name", "csv_bytes", "total_rows", "restart", "attempts")
+                    return dict(zip(keys, row))
+            except Exception as e:
+                _report(f"Failed to claim an ingest job: {e}")
+    return None
+
+class _IngestJobCsv(io.RawIOBase):
+    """A job's CSV read from ingest_jobs.csv_data JOB_CSV_READ_BYTES at a time."""
+
+    def __init__(self, job_id, size):
+        self.job_id = job_id
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        length = min(len(buffer), JOB_CSV_READ_BYTES, self.size - self.position)
+        if length <= 0:
+            return 0
+        with db_connection() as conn:
+            if conn is None:
+                raise OSError(f"No database connection to read the CSV of ingest job {self.job_id}.")
             with conn.cursor() as c:
-                # Prepare data for efficient bulk insertion
-                tuples = [tuple(x) for x in df.to_numpy()]
-                cols = ','.join(list(df.columns))
-                sql = f"INSERT INTO reviews ({cols}) VALUES %s"
-                
-                from psycopg2.extras import execute_values
-                execute_values(c, sql, tuples)
-            conn.commit()
-        except Exception as e:
-            st.error(f"Error during bulk insert: {e}")
-        finally:
-            conn.close()
+                # substring() on BYTEA counts from 1.
+                c.execute("SELECT substring(csv_data FROM %s FOR %s) FROM ingest_jobs WHERE id = %s",
+                          (self.position + 1, length, self.job_id))
+                row = c.fetchone()
+            conn.rollback()
+        if row is None or row[0] is None:
+            raise OSError(f"The CSV of ingest job {self.job_id} is no longer stored.")
+        piece = memoryview(row[0]).cast("B")
+        memoryview(buffer).cast("B")[:len(piece)] = piece
+        self.position += len(piece)
+        return len(piece)
+
+def open_ingest_job_csv(job_id, size):
+    """
+    Opens a claimed job's CSV as a binary file that is read from the database
+    in JOB_CSV_READ_BYTES pieces, so a worker's memory does not grow with the
+    upload. Read errors raise OSError.
+    """
+    return io.BufferedReader(_IngestJobCsv(job_id, size or 0), buffer_size=JOB_CSV_READ_BYTES)
+
+def update_ingest_job_progress(job_id, worker_id, rows_done):
+    """
+    Records progress and a heartbeat for a running job.
+
+    Returns:
+        True if worker_id still owns the running job, False if it was
+        cancelled or handed to another worker, None on error.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute(
+                        """
+                        UPDATE ingest_jobs SET rows_done = %s, heartbeat_at = NOW()
+                        WHERE id = %s AND worker = %s AND status = 'running'
+                        """,
+                        (rows_done, job_id, worker_id)
+                    )
+                    owned = c.rowcount == 1
+                conn.commit()
+                return owned
+            except Exception as e:
+                _report(f"Failed to record ingest job progress: {e}")
+    return None
+
+def finish_ingest_job(job_id, worker_id, status, summary=None, error=None):
+    """
+    Moves a running job owned by worker_id to `status` ('done', 'failed', or
+    'queued' to retry it later), storing the ingest summary and any error.
+    A finished job's CSV is dropped; a requeued one keeps it for the retry.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute(
+                        """
+                        UPDATE ingest_jobs SET status = %s, summary = %s::jsonb, error = %s, heartbeat_at = NOW(),
+                            finished_at = CASE WHEN %s IN ('done', 'failed') THEN NOW() END,
+                            worker = CASE WHEN %s = 'queued' THEN NULL ELSE worker END,
+                            csv_data = CASE WHEN %s = 'queued' THEN csv_data END
+                        WHERE id = %s AND worker = %s AND status = 'running'
+                        """,
+                        (status, json.dumps(summary) if summary is not None else None, error,
+                         status, status, status, job_id, worker_id)
+                    )
+                conn.commit()
+            except Exception as e:
+                _report(f"Failed to update the ingest job: {e}")
+
+def cancel_ingest_job(job_id):
+    """
+    Cancels a queued or running job and drops its CSV; a running worker has
+    its own copy and stops at its next heartbeat.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute(
+                        """
+                        UPDATE ingest_jobs SET status = 'cancelled', finished_at = NOW(), csv_data = NULL
+                        WHERE id = %s AND status IN ('queued', 'running')
+                        """,
+                        (job_id,)
+                    )
+                conn.commit()
+            except Exception as e:
+                _report(f"Failed to cancel the ingest job: {e}")
+
+def fetch_ingest_jobs(job_ids=None, limit=20):
+    """
+    Fetches job status (without the CSV data) for the given job ids, or for
+    the most recent jobs if job_ids is None.
+
+    Returns:
+        A list of dicts, newest first, or None on error.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    if job_ids is None:
+                        c.execute(f"SELECT {_JOB_STATUS_COLUMNS} FROM ingest_jobs ORDER BY id DESC LIMIT %s", (limit,))
+                    else:
+                        c.execute(f"SELECT {_JOB_STATUS_COLUMNS} FROM ingest_jobs WHERE id = ANY(%s) ORDER BY id DESC",
+                                  (list(job_ids),))
+                    columns = [column.name for column in c.description]
+                    return [dict(zip(columns, row)) for row in c.fetchall()]
+            except Exception as e:
+                _report(f"Failed to fetch ingest jobs: {e}")
+    return None
 
 def fetch_all_reviews():
     """Fetches all review records from the database."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            df = pd.read_sql_query("SELECT timestamp, review_text, predicted_label FROM reviews ORDER BY timestamp DESC", conn)
-            return df
-        except Exception as e:
-            st.error(f"Failed to fetch data from the database: {e}")
-            return None
-        finally:
-            conn.close()
+    with db_connection() as conn:
+        if conn:
+            try:
+                with metrics.timed("db.fetch_all_reviews") as stage:
+                    df = pd.read_sql_query("SELECT timestamp, review_text, predicted_label FROM reviews ORDER BY timestamp DESC", conn)
+                    stage.rows = len(df)
+                return df
+            except Exception as e:
+                _report(f"Failed to fetch data from the database: {e}")
+                return None
             
+REVIEW_PAGE_ROWS = 50_000  # rows per keyset page when loading review history
+
+def fetch_reviews_since(last_id=0, page_size=REVIEW_PAGE_ROWS):
+    """
+    Fetches the next page of reviews after last_id, in id order. Keyset
+    pagination walks the primary key index from last_id, so each page costs
+    the same however deep into the table it is.
+
+    Returns:
+        A DataFrame with id, timestamp, review_text and predicted_label
+        (empty when there is nothing newer), or None on error.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with metrics.timed("db.fetch_reviews_page") as stage:
+                    page = pd.read_sql_query(
+                        "SELECT id, timestamp, review_text, predicted_label FROM reviews WHERE id > %s ORDER BY id LIMIT %s",
+                        conn, params=(int(last_id), int(page_size))
+                    )
+                    stage.rows = len(page)
+                return page
+            except Exception as e:
+                _report(f"Failed to fetch data from the database: {e}")
+    return None
+
+def fetch_reviews_in_ranges(lows, highs):
+    """
+    Fetches the reviews whose id falls in any of the inclusive ranges
+    lows[i]..highs[i], in id order. Used to pick up rows that committed into
+    id gaps a keyset page has already passed.
+
+    Returns:
+        A DataFrame with the same columns as fetch_reviews_since, or None on error.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                with metrics.timed("db.fetch_reviews_gaps") as stage:
+                    page = pd.read_sql_query(
+                        """
+                        SELECT r.id, r.timestamp, r.review_text, r.predicted_label
+                        FROM unnest(%s::bigint[], %s::bigint[]) AS gap (low, high)
+                        JOIN reviews r ON r.id BETWEEN gap.low AND gap.high
+                        ORDER BY r.id
+                        """,
+                        conn, params=([int(low) for low in lows], [int(high) for high in highs])
+                    )
+                    stage.rows = len(page)
+                return page
+            except Exception as e:
+                _report(f"Failed to fetch data from the database: {e}")
+    return None
+
+def fetch_daily_sentiment(start_date=None, end_date=None):
+    """
+    Fetches per-day review counts by sentiment from the daily_sentiment rollup,
+    optionally limited to an inclusive date range.
+
+    Returns:
+        A DataFrame with 'date', 'predicted_label' and 'count' columns, or None on error.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                query = '''
+                    SELECT day AS date, predicted_label, review_count AS count
+                    FROM daily_sentiment
+                    WHERE (%(start)s::date IS NULL OR day >= %(start)s::date)
+                      AND (%(end)s::date IS NULL OR day <= %(end)s::date)
+                    ORDER BY day
+                '''
+                with conn.cursor() as c, metrics.timed("db.fetch_daily_sentiment") as stage:
+                    c.execute(query, {"start": start_date, "end": end_date})
+                    rows = c.fetchall()
+                    stage.rows = len(rows)
+                return pd.DataFrame(rows, columns=['date', 'predicted_label', 'count'])
+            except Exception as e:
+                _report(f"Failed to fetch the daily sentiment trend: {e}")
+    return None
+
+def fetch_cached_predictions(cache_keys):
+    """
+    Looks up cached model predictions.
+
+    Returns:
+        A dict mapping each cache key found to a {'label', 'confidence'} dictionary.
+    """
+    cache_keys = list(cache_keys)
+    if not cache_keys:
+        return {}
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c, metrics.timed("db.prediction_cache_read") as stage:
+                    c.execute(
+                        "SELECT cache_key, label, confidence FROM prediction_cache WHERE cache_key = ANY(%s)",
+                        (cache_keys,)
+                    )
+                    stage.rows = len(cache_keys)
+                    return {key: {"label": label, "confidence": confidence} for key, label, confidence in c.fetchall()}
+            except Exception as e:
+                _report(f"Failed to read the prediction cache: {e}")
+    return {}
+
+def store_cached_predictions(predictions, model_version):
+    """Stores a dict of cache key -> {'label', 'confidence'} in the prediction cache."""
+    if not predictions:
+        return
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c, metrics.timed("db.prediction_cache_write") as stage:
+                    rows = [(key, model_version, p["label"], p["confidence"]) for key, p in predictions.items()]
+                    stage.rows = len(rows)
+                    from psycopg2.extras import execute_values
+                    execute_values(
+                        c,
+                        "INSERT INTO prediction_cache (cache_key, model_version, label, confidence) VALUES %s "
+                        "ON CONFLICT (cache_key) DO NOTHING",
+                        rows
+                    )
+                conn.commit()
+            except Exception as e:
+                _report(f"Failed to write to the prediction cache: {e}")
+
+def clear_prediction_cache(keep_version=None):
+    """Deletes cached predictions. If keep_version is given, only entries from other model versions are removed."""
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c:
+                    if keep_version is None:
+                        c.execute("TRUNCATE prediction_cache")
+                    else:
+                        c.execute("DELETE FROM prediction_cache WHERE model_version <> %s", (keep_version,))
+                conn.commit()
+            except Exception as e:
+                _report(f"Failed to clear the prediction cache: {e}")
+
+def get_indexed_aspect_counts(keywords):
+    """
+    Looks aspects up in the precomputed aspect index, without touching review
+    text. Keywords are lemmatized like the reviews, so 'rooms' finds 'room'.
+    Only keywords that reduce to a single term can be answered from the index.
+
+    Returns:
+        A dict mapping each single-term keyword to its counts dict, or None on error.
+    """
+    terms = {keyword: review_terms(keyword) for keyword in keywords}
+    terms = {keyword: next(iter(t)) for keyword, t in terms.items() if len(t) == 1}
+    if not terms:
+        return {}
+    with db_connection() as conn:
+        if conn:
+            try:
+                with conn.cursor() as c, metrics.timed("db.aspect_index_lookup"):
+                    c.execute(
+                        "SELECT term, predicted_label, review_count FROM aspect_index WHERE term = ANY(%s)",
+                        (list(set(terms.values())),)
+                    )
+                    by_term = {}
+                    for term, label, count in c.fetchall():
+                        by_term.setdefault(term, {})[label] = count
+                counts = {}
+                for keyword, term in terms.items():
+                    labels = by_term.get(term, {})
+                    counts[keyword] = {
+                        "total_mentions": labels.get(1, 0) + labels.get(0, 0),
+                        "happy_mentions": labels.get(1, 0),
+                        "not_happy_mentions": labels.get(0, 0)
+                    }
+                return counts
+            except Exception as e:
+                _report(f"Failed to read the aspect index: {e}")
+    return None
+
+def lookup_aspect_counts(keywords):
+    """
+    Counts mentions for each aspect: single words come from the aspect index,
+    anything else (phrases, stopwords) from the full-text search.
+
+    Returns:
+        A dict mapping each keyword to its counts dict, or None on error.
+    """
+    keywords = list(dict.fromkeys(keywords))
+    counts = get_indexed_aspect_counts(keywords)
+    if counts is None:
+        return None
+    remaining = [keyword for keyword in keywords if keyword not in counts]
+    metrics.increment("aspect_lookups", len(counts), tier="aspect_index", result="hit")
+    metrics.increment("aspect_lookups", len(remaining), tier="aspect_index", result="miss")
+    if remaining:
+        searched = get_multi_aspect_counts(remaining)
+        if searched is None:
+            return None
+        counts.update(searched)
+    return counts
+
 # --- NEW, MORE EFFICIENT FUNCTION FOR ASPECT ANALYSIS ---
 def get_aspect_counts(keyword: str):
     """
     Fetches the total, happy, and not happy counts for a specific keyword
     directly from the database using an efficient SQL query.
     """
-    conn = get_db_connection()
-    if conn:
-        try:
-            # This single query does all the counting on the database side.
-            # FILTER is a powerful Postgres feature for conditional aggregation.
-            query = """
-                SELECT
-                    COUNT(*) AS total_mentions,
-                    COUNT(*) FILTER (WHERE predicted_label = 1) AS happy_mentions,
-                    COUNT(*) FILTER (WHERE predicted_label = 0) AS not_happy_mentions
-                FROM
-                    reviews
-                WHERE
-                    review_text ILIKE %s;
-            """
-            with conn.cursor() as c:
-                c.execute(query, (f'%{keyword}%',))
-                # Fetch the single row of results
-                counts = c.fetchone()
-                if counts:
+    counts = get_multi_aspect_counts([keyword])
+    return counts.get(keyword) if counts is not None else None
+
+def get_multi_aspect_counts(keywords):
+    """
+    Fetches total, happy and not happy counts for several aspects in one query.
+
+    Matching is word-level and stemmed ('room' also matches 'rooms', but 'bed'
+    does not match 'embedded'), and uses the GIN index on review_tsv.
+
+    Returns:
+        A dict mapping each keyword to its counts dict, or None on error.
+    """
+    keywords = list(dict.fromkeys(keywords))
+    if not keywords:
+        return {}
+    with db_connection() as conn:
+        if conn:
+            try:
+                # One index lookup per aspect; FILTER does the conditional counting in the same pass.
+                query = """
+                    SELECT
+                        a.aspect,
+                        COUNT(r.id) AS total_mentions,
+                        COUNT(r.id) FILTER (WHERE r.predicted_label = 1) AS happy_mentions,
+                        COUNT(r.id) FILTER (WHERE r.predicted_label = 0) AS not_happy_mentions
+                    FROM
+                        unnest(%s::text[]) AS a(aspect)
+                        LEFT JOIN reviews r ON r.review_tsv @@ plainto_tsquery('english', a.aspect)
+                    GROUP BY
+                        a.aspect;
+                """
+                with conn.cursor() as c, metrics.timed("db.aspect_search") as stage:
+                    c.execute(query, (keywords,))
+                    stage.rows = len(keywords)
                     return {
-                        "total_mentions": counts[0],
-                        "happy_mentions": counts[1],
-                        "not_happy_mentions": counts[2]
+                        aspect: {
+                            "total_mentions": total,
+                            "happy_mentions": happy,
+                            "not_happy_mentions": not_happy
+                        }
+                        for aspect, total, happy, not_happy in c.fetchall()
                     }
-        except Exception as e:
-            st.error(f"Failed to fetch aspect counts from the database: {e}")
-            return None
-        finally:
-            conn.close()
-    return None
\ No newline at end of file
+            except Exception as e:
+                _report(f"Failed to fetch aspect counts from the database: {e}")
+    return None
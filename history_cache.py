@@ -0,0 +1,186 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from database import REVIEW_PAGE_ROWS, fetch_reviews_in_ranges, fetch_reviews_since
+
+HISTORY_REFRESH_INTERVAL = 5  # seconds; refreshes closer together than this reuse the cached rows
+HISTORY_IDLE_TTL = 15 * 60  # seconds without any reader before the cached rows are dropped
+HISTORY_MAX_ROWS = 500_000  # newest rows kept; older ones are evicted
+# Ids this far below the newest cached one are checked again on every refresh for
+# reviews that committed late. An upload chunk takes its ids inside a transaction
+# that can last seconds, while single reviews with higher ids commit first.
+HISTORY_RESCAN_IDS = 100_000
+
+_history = None
+_history_lock = threading.Lock()
+
+
+class ReviewHistoryCache:
+    """
+    A process-wide copy of the reviews table, shared by every dashboard
+    session. A refresh asks the database only for rows with an id above the
+    highest one already cached (keyset pagination) and appends them, so its
+    cost follows the number of new reviews rather than the table size.
+
+    Rows are kept as a list of page frames, newest last; the combined frame
+    handed to sessions is built once per change and shared, not copied.
+
+    Ids commit out of order: an upload still in flight during a refresh
+    commits rows below the cached maximum later. Each refresh therefore also
+    asks for the ids missing from the cache among the last rescan_ids, which
+    is cheap because those gaps are few and the query only returns rows that
+    have appeared in them. reload() starts over from an empty cache.
+    """
+
+    def __init__(self, fetch_page=fetch_reviews_since, page_size=REVIEW_PAGE_ROWS,
+                 refresh_interval=HISTORY_REFRESH_INTERVAL, idle_ttl=HISTORY_IDLE_TTL, max_rows=HISTORY_MAX_ROWS,
+                 fetch_ranges=fetch_reviews_in_ranges, rescan_ids=HISTORY_RESCAN_IDS):
+        self.fetch_page = fetch_page
+        self.fetch_ranges = fetch_ranges
+        self.rescan_ids = rescan_ids
+        self.page_size = page_size
+        self.refresh_interval = refresh_interval
+        self.idle_ttl = idle_ttl
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._reset()
+        self._refreshes = 0
+        self._throttled = 0
+        self._rows_fetched = 0
+        self._pages_fetched = 0
+        self._evicted_rows = 0
+        self._late_rows = 0
+
+    def _reset(self):
+        self._pages = []
+        self._rows = 0
+        self._last_id = 0
+        self._recent_ids = np.empty(0, dtype=np.int64)  # sorted cached ids within rescan_ids of _last_id
+        self._out_of_order = False
+        self._synced_at = None
+        self._last_read = time.monotonic()
+        self._snapshot = None
+
+    def refresh(self, force=False):
+        """
+        Brings the cache up to date with the database and returns the rows as
+        a DataFrame (timestamp, review_text, predicted_label), newest first.
+        Within refresh_interval of the last sync the cached rows are returned
+        without querying, unless force is set. Returns None if nothing could
+        be loaded.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._synced_at is not None and now - self._last_read > self.idle_ttl:
+                self._reset()
+            self._last_read = now
+            if force or self._synced_at is None or now - self._synced_at >= self.refresh_interval:
+                if not (self._fetch_new_rows() and self._fetch_late_rows()) and self._synced_at is None:
+                    return None
+                self._synced_at = time.monotonic()
+            else:
+                self._throttled += 1
+            return self._combined()
+
+    def reload(self):
+        """Drops the cached rows and loads the table again from the start."""
+        with self._lock:
+            self._reset()
+        return self.refresh(force=True)
+
+    def _fetch_new_rows(self):
+        self._refreshes += 1
+        while True:
+            page = self.fetch_page(self._last_id, self.page_size)
+            if page is None:
+                return False
+            self._pages_fetched += 1
+            if page.empty:
+                return True
+            self._add_rows(page)
+            self._last_id = int(page['id'].iloc[-1])
+            if len(page) < self.page_size:
+                return True
+
+    def _fetch_late_rows(self):
+        """Fetches rows that committed into id gaps below _last_id since those ids were passed."""
+        low = max(self._last_id - self.rescan_ids, 0)
+        self._recent_ids = self._recent_ids[self._recent_ids > low]
+        bounds = np.concatenate(([low], self._recent_ids, [self._last_id + 1]))
+        gaps = np.flatnonzero(np.diff(bounds) > 1)
+        if not len(gaps):
+            return True
+        page = self.fetch_ranges((bounds[gaps] + 1).tolist(), (bounds[gaps + 1] - 1).tolist())
+        if page is None:
+            return False
+        if not page.empty:
+            self._late_rows += len(page)
+            self._out_of_order = True
+            self._add_rows(page)
+        return True
+
+    def _add_rows(self, page):
+        self._pages.append(page)
+        self._rows += len(page)
+        self._rows_fetched += len(page)
+        self._recent_ids = np.union1d(self._recent_ids, page['id'].to_numpy(dtype=np.int64))
+        self._snapshot = None
+        self._evict_oldest()
+
+    def _evict_oldest(self):
+        while self._rows > self.max_rows:
+            excess = self._rows - self.max_rows
+            oldest = self._pages[0]
+            if len(oldest) <= excess:
+                self._pages.pop(0)
+                dropped = len(oldest)
+            else:
+                self._pages[0] = oldest.iloc[excess:]
+                dropped = excess
+            self._rows -= dropped
+            self._evicted_rows += dropped
+
+    def _combined(self):
+        if self._snapshot is None:
+            if self._pages:
+                combined = pd.concat(self._pages, ignore_index=True) if len(self._pages) > 1 else self._pages[0]
+                if self._out_of_order:
+                    combined = combined.sort_values('id', kind='stable', ignore_index=True)
+                    self._out_of_order = False
+                self._pages = [combined]
+            else:
+                combined = pd.DataFrame(columns=['id', 'timestamp', 'review_text', 'predicted_label'])
+            self._snapshot = combined[['timestamp', 'review_text', 'predicted_label']].iloc[::-1].reset_index(drop=True)
+        return self._snapshot
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def stats(self):
+        """Returns cache size and refresh figures for display."""
+        with self._lock:
+            return {
+                "rows": self._rows,
+                "last_id": self._last_id,
+                "refreshes": self._refreshes,
+                "throttled_refreshes": self._throttled,
+                "rows_fetched": self._rows_fetched,
+                "pages_fetched": self._pages_fetched,
+                "evicted_rows": self._evicted_rows,
+                "late_rows": self._late_rows,
+                "seconds_since_sync": None if self._synced_at is None else time.monotonic() - self._synced_at,
+            }
+
+
+def get_review_history():
+    """Returns the process-wide review history cache, creating it on first use."""
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = ReviewHistoryCache()
+    return _history
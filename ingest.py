@@ -0,0 +1,134 @@
+import hashlib
+from collections import Counter
+
+import pandas as pd
+import streamlit as st
+
+import metrics
+from api_client import predict_sentiment_batch
+from database import commit_ingest_chunk, get_ingest_checkpoint, reset_ingest_checkpoint
+
+INGEST_CHUNK_ROWS = 5_000  # CSV rows read, scored and committed at a time
+LABEL_MAP = {'Happy': 1, 'Not Happy': 0, 'Error': -1}
+
+
+# --- HELPER FUNCTION FOR DATE CLEANING ---
+def normalize_timestamps(df, column_name='Time_Stamp', warn=True):
+    with metrics.timed("ingest.normalize_timestamps") as stage:
+        df[column_name] = pd.to_datetime(df[column_name], errors='coerce')
+        stage.rows = len(df)
+    failed_parses = df[column_name].isnull().sum()
+    if warn and failed_parses > 0:
+        st.warning(f"{failed_parses} rows had a date format that could not be understood and were ignored.")
+    df.dropna(subset=[column_name], inplace=True)
+    return df
+
+
+def file_fingerprint(file, block_size=1 << 20):
+    """
+    Hashes an uploaded file's contents in blocks, so a re-upload of the same
+    file maps to the same checkpoint. Also counts lines for progress reporting.
+
+    Returns:
+        A (sha256 hex digest, line count) tuple. The file is rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    lines = 0
+    file.seek(0)
+    for block in iter(lambda: file.read(block_size), b""):
+        digest.update(block)
+        lines += block.count(b"\n")
+    file.seek(0)
+    return digest.hexdigest(), lines
+
+
+def ingest_csv(file, file_key, file_name=None, chunk_rows=INGEST_CHUNK_ROWS, restart=False,
+               progress_callback=None, total_rows=None):
+    """
+    Streams a CSV with 'Time_Stamp' and 'Description' columns into the
+    database one chunk at a time. Each chunk has its timestamps normalized,
+    its reviews scored and its rows committed together with a checkpoint, so
+    memory stays bounded by the chunk size and a re-upload of the same file
+    resumes after the last committed chunk.
+
+    Args:
+        file: A binary file-like object positioned at the start of the CSV.
+        file_key: Identifies the file's checkpoint (see file_fingerprint).
+        file_name: Stored with the checkpoint for reference.
+        chunk_rows: Number of CSV rows per chunk.
+        restart: Ignore any existing checkpoint and start from the first row.
+        progress_callback: Optional callable(rows_done, total_rows).
+        total_rows: Expected number of rows, used only for progress reporting.
+
+    Returns:
+        A summary dict with row counts, per-label counts ('label_counts', keyed
+        by 1, 0 and -1) and aggregated prediction cache statistics.
+    """
+    if restart:
+        reset_ingest_checkpoint(file_key)
+    checkpoint = get_ingest_checkpoint(file_key) or {"rows_committed": 0, "completed": False}
+    resume_from = checkpoint["rows_committed"]
+
+    summary = {
+        "resumed_from": resume_from,
+        "already_completed": checkpoint["completed"],
+        "rows_read": 0,
+        "invalid_timestamps": 0,
+        "failed_predictions": 0,
+        "rows_saved": 0,
+        "duplicates_skipped": 0,
+        "completed": checkpoint["completed"],
+        "label_counts": Counter(),
+        "cache": Counter(),
+    }
+    if checkpoint["completed"]:
+        return summary
+
+    total_rows = max(total_rows or 0, 1)
+    rows_seen = 0
+    # The with-block releases the reader without closing the caller's file, even on errors.
+    with pd.read_csv(file, chunksize=chunk_rows, usecols=['Time_Stamp', 'Description']) as reader:
+        for chunk in reader:
+            chunk_start = rows_seen
+            rows_seen += len(chunk)
+            if rows_seen <= resume_from:
+                continue  # committed by an earlier run
+            if chunk_start < resume_from:
+                chunk = chunk.iloc[resume_from - chunk_start:].copy()
+            summary["rows_read"] += len(chunk)
+
+            rows_before = len(chunk)
+            chunk = normalize_timestamps(chunk, 'Time_Stamp', warn=False)
+            summary["invalid_timestamps"] += rows_before - len(chunk)
+
+            def chunk_progress(done, _total, offset=rows_seen - rows_before):
+                if progress_callback:
+                    progress_callback(offset + done, max(total_rows, rows_seen))
+
+            cache_stats = {}
+            with metrics.timed("ingest.score_chunk") as stage:
+                api_results = predict_sentiment_batch(chunk['Description'].astype(str).tolist(),
+                                                      progress_callback=chunk_progress, stats=cache_stats)
+                stage.rows = len(chunk)
+            summary["cache"].update(cache_stats)
+
+            labels = pd.Series([LABEL_MAP[r['label']] if r else -1 for r in api_results], index=chunk.index)
+            summary["label_counts"].update(labels.value_counts().to_dict())
+            summary["failed_predictions"] += int((labels == -1).sum())
+
+            df_to_db = pd.DataFrame({
+                'timestamp': chunk['Time_Stamp'],
+                'review_text': chunk['Description'],
+                'predicted_label': labels,
+            })[labels != -1]
+            saved = commit_ingest_chunk(file_key, file_name, rows_seen, df_to_db)
+            if saved is None:
+                return summary  # stop here; the next upload resumes from the last committed chunk
+            summary["rows_saved"] += saved["inserted"]
+            summary["duplicates_skipped"] += saved["skipped"]
+
+            if progress_callback:
+                progress_callback(rows_seen, max(total_rows, rows_seen))
+
+    summary["completed"] = commit_ingest_chunk(file_key, file_name, rows_seen, pd.DataFrame(), completed=True) is not None
+    return summary
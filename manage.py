@@ -0,0 +1,120 @@
+"""
+Maintenance commands for the review database. Reads the connection string
+from DATABASE_URL or .streamlit/secrets.toml, like the app.
+
+    python manage.py rebuild-daily-sentiment
+    python manage.py rebuild-aspect-index
+    python manage.py dedupe-reviews
+    python manage.py migrate-partitions
+    python manage.py partitions
+    python manage.py drop-reviews-before 2023-01-01
+"""
+import argparse
+import sys
+import time
+from datetime import date
+
+import database
+
+
+def rebuild_daily_sentiment(args):
+    rows = database.rebuild_daily_sentiment()
+    if rows is None:
+        print("Rebuilding daily_sentiment failed.", file=sys.stderr)
+        return 1
+    print(f"daily_sentiment rebuilt: {rows} (day, label) rows.")
+    return 0
+
+
+def rebuild_aspect_index(args):
+    start = time.perf_counter()
+    entries = database.rebuild_aspect_index(
+        progress_callback=lambda done: print(f"\r{done} reviews processed", end="", flush=True)
+    )
+    print()
+    if entries is None:
+        print("Rebuilding aspect_index failed.", file=sys.stderr)
+        return 1
+    print(f"aspect_index rebuilt: {entries} (term, label) entries in {time.perf_counter() - start:.1f}s.")
+    return 0
+
+
+def dedupe_reviews(args):
+    deleted = database.dedupe_reviews()
+    if deleted is None:
+        print("Removing duplicate reviews failed; nothing was deleted.", file=sys.stderr)
+        return 1
+    print(f"Removed {deleted} duplicate reviews; uploads now skip reviews that are already stored.")
+    if deleted:
+        print("The analytics snapshot still holds them until it is rebuilt ('Rebuild snapshot' on the dashboard).")
+    return 0
+
+
+def migrate_partitions(args):
+    if database.list_review_partitions():
+        print("reviews is already partitioned by month.")
+        return 0
+    start = time.perf_counter()
+    moved = database.migrate_reviews_to_partitioned()
+    if moved is None:
+        print("Migrating reviews to monthly partitions failed; the table was left unchanged.", file=sys.stderr)
+        return 1
+    print(f"reviews migrated to monthly partitions: {moved} reviews moved in {time.perf_counter() - start:.1f}s.")
+    print("Restart running apps and workers so they create partitions for new months.")
+    return 0
+
+
+def show_partitions(args):
+    partitions = database.list_review_partitions()
+    if partitions is None:
+        return 1
+    if not partitions:
+        print("reviews is not partitioned; run 'python manage.py migrate-partitions'.")
+        return 0
+    for name, month, estimated_rows, size in partitions:
+        print(f"{name:<20} {month.isoformat() if month else 'default':<10} ~{estimated_rows:>10} rows {size / 2**20:10.1f} MiB")
+    return 0
+
+
+def drop_reviews_before(args):
+    start = time.perf_counter()
+    result = database.drop_reviews_before(args.cutoff, progress_callback=print)
+    if result is None:
+        print("Deleting old reviews failed.", file=sys.stderr)
+        return 1
+    print(f"Removed {result['rows_deleted']} reviews ({result['partitions_dropped']} partitions dropped) "
+          f"in {time.perf_counter() - start:.1f}s.")
+    print("The analytics snapshot still holds them until it is rebuilt ('Rebuild snapshot' on the dashboard).")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hotel review database maintenance.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sub = subparsers.add_parser("rebuild-daily-sentiment", help="Recompute the daily sentiment rollup from the reviews table.")
+    sub.set_defaults(func=rebuild_daily_sentiment)
+
+    sub = subparsers.add_parser("rebuild-aspect-index", help="Recompute the lemmatized aspect index from the reviews table.")
+    sub.set_defaults(func=rebuild_aspect_index)
+
+    sub = subparsers.add_parser("dedupe-reviews", help="Delete repeated reviews (same timestamp and text) and add the unique key.")
+    sub.set_defaults(func=dedupe_reviews)
+
+    sub = subparsers.add_parser("migrate-partitions", help="Move an unpartitioned reviews table into monthly partitions.")
+    sub.set_defaults(func=migrate_partitions)
+
+    sub = subparsers.add_parser("partitions", help="List the monthly partitions of the reviews table.")
+    sub.set_defaults(func=show_partitions)
+
+    sub = subparsers.add_parser("drop-reviews-before", help="Delete reviews older than the month of a date (YYYY-MM-DD).")
+    sub.add_argument("cutoff", type=date.fromisoformat)
+    sub.set_defaults(func=drop_reviews_before)
+
+    args = parser.parse_args(argv)
+    database.setup_database()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""
+Lightweight, process-wide instrumentation for the app's hot paths.
+
+Stages (API round trips, database queries, timestamp parsing, figure
+construction, ...) are timed with `timed`, which records a latency histogram,
+a row count for rows/sec and an error count per stage. Plain counters (cache
+hits, retries, ...) go through `increment`. Everything can be read back with
+`snapshot` for the Diagnostics tab, or exported in the Prometheus text format
+with `render_prometheus`, `write_prometheus` or `start_metrics_server`.
+
+    with metrics.timed("db.insert_reviews") as stage:
+        ...
+        stage.rows = len(df)
+"""
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = "sentiment_app"
+# Optional exports: serve /metrics on this port, and/or rewrite this file on every app rerun.
+METRICS_PORT = os.environ.get("METRICS_PORT")
+METRICS_FILE = os.environ.get("METRICS_FILE")
+# Histogram bucket upper bounds, in seconds.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+PROFILE_HISTORY = 5  # most recent cProfile captures kept
+PROFILE_TOP_FUNCTIONS = 30
+PROFILE_STALE_AFTER = 300  # seconds after which an unfinished capture (from an interrupted rerun) is discarded
+
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+_profiles = deque(maxlen=PROFILE_HISTORY)
+# (profiler, started) of the capture in progress. Only one runs at a time: on
+# Python 3.12+ cProfile is interpreter-wide and a second enable() raises ValueError.
+_active_profile = None
+_server = None
+_started_at = time.time()
+
+
+class _Stage:
+    __slots__ = ("buckets", "count", "total_seconds", "max_seconds", "rows", "errors")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.errors = 0
+
+    def quantile(self, q):
+        """Estimates a latency quantile by interpolating within its histogram bucket."""
+        if not self.count:
+            return None
+        target, seen, lower = q * self.count, 0, 0.0
+        for upper, n in zip(LATENCY_BUCKETS, self.buckets):
+            if n and seen + n >= target:
+                upper = min(upper, self.max_seconds)
+                return lower + (upper - lower) * (target - seen) / n
+            seen += n
+            lower = upper
+        return self.max_seconds
+
+
+def observe(stage, seconds, rows=0, error=False):
+    """Records one timed run of a stage."""
+    with _lock:
+        entry = _stages.get(stage)
+        if entry is None:
+            entry = _stages[stage] = _Stage()
+        for i, upper in enumerate(LATENCY_BUCKETS):
+            if seconds <= upper:
+                entry.buckets[i] += 1
+                break
+        entry.count += 1
+        entry.total_seconds += seconds
+        entry.max_seconds = max(entry.max_seconds, seconds)
+        entry.rows += rows
+        entry.errors += bool(error)
+
+
+def increment(name, n=1, **labels):
+    """Adds n to a counter, e.g. increment("prediction_cache_lookups", 5, tier="memory", result="hit")."""
+    # Label values are stored as text, as Prometheus sees them; mixing e.g. 200 and "connection_error" stays sortable.
+    key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+class timed(ContextDecorator):
+    """
+    Times a stage, as a context manager or a decorator. Set `.rows` on the
+    context manager to record how many rows the stage handled. An exception
+    leaving the block is counted as an error for the stage and re-raised.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.rows = 0
+
+    def _recreate_cm(self):
+        # Each decorated call gets its own instance, so concurrent calls do not share a start time.
+        return type(self)(self.stage)
+
+    def __enter__(self):
+        self.rows = 0
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self._start, self.rows, error=exc_type is not None)
+        return False
+
+
+def snapshot():
+    """
+    Returns the current metrics: 'stages' (a list of dicts with count, errors,
+    mean / p50 / p95 / p99 / max milliseconds, rows and rows_per_sec) and
+    'counters' (a dict of (name, labels) -> value).
+    """
+    ms = lambda seconds: None if seconds is None else 1000 * seconds
+    with _lock:
+        stages = []
+        for name, entry in sorted(_stages.items()):
+            stages.append({
+                "stage": name,
+                "count": entry.count,
+                "errors": entry.errors,
+                "mean_ms": ms(entry.total_seconds / entry.count),
+                "p50_ms": ms(entry.quantile(0.5)),
+                "p95_ms": ms(entry.quantile(0.95)),
+                "p99_ms": ms(entry.quantile(0.99)),
+                "max_ms": ms(entry.max_seconds),
+                "total_s": entry.total_seconds,
+                "rows": entry.rows,
+                "rows_per_sec": entry.rows / entry.total_seconds if entry.rows and entry.total_seconds else None,
+            })
+        return {"stages": stages, "counters": dict(_counters), "uptime_s": time.time() - _started_at}
+
+
+def hit_rates(counter_name):
+    """
+    For a counter incremented with tier= and result='hit'/'miss' labels,
+    returns {tier: (hits, lookups)}.
+    """
+    rates = {}
+    with _lock:
+        for (name, labels), value in _counters.items():
+            if name != counter_name:
+                continue
+            labels = dict(labels)
+            hits, lookups = rates.get(labels.get("tier"), (0, 0))
+            rates[labels.get("tier")] = (hits + (value if labels.get("result") == "hit" else 0), lookups + value)
+    return rates
+
+
+def reset():
+    """Clears all stages and counters."""
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+
+def render_prometheus():
+    """Returns all metrics in the Prometheus text exposition format."""
+    with _lock:
+        stages = sorted(_stages.items())
+        counters = sorted(_counters.items())
+    seconds = f"{METRIC_PREFIX}_stage_duration_seconds"
+    lines = [f"# HELP {seconds} Time spent per instrumented stage.", f"# TYPE {seconds} histogram"]
+    for name, entry in stages:
+        cumulative = 0
+        for upper, n in zip(LATENCY_BUCKETS, entry.buckets):
+            cumulative += n
+            le = "+Inf" if upper == float("inf") else repr(upper)
+            lines.append(f'{seconds}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'{seconds}_sum{{stage="{name}"}} {entry.total_seconds}')
+        lines.append(f'{seconds}_count{{stage="{name}"}} {entry.count}')
+    for suffix, attribute, help_text in (("rows_total", "rows", "Rows handled per stage."),
+                                         ("errors_total", "errors", "Failed runs per stage.")):
+        metric = f"{METRIC_PREFIX}_stage_{suffix}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        lines += [f'{metric}{{stage="{name}"}} {getattr(entry, attribute)}' for name, entry in stages]
+    typed = set()
+    for (name, labels), value in counters:
+        metric = f"{METRIC_PREFIX}_{name}_total"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_label_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Writes the metrics to a file atomically, e.g. for node_exporter's textfile collector."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+    return path
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serves /metrics on a background thread, once per process. Returns the server's URL."""
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True, name="metrics-server").start()
+        return f"http://{_server.server_address[0]}:{_server.server_address[1]}/metrics"
+
+
+# --- Optional cProfile capture ---
+def start_profile():
+    """
+    Starts a cProfile capture of the calling thread and returns the profiler,
+    or None if another capture is running or the profiler hook is taken
+    (for example by a debugger or coverage).
+    """
+    global _active_profile
+    with _lock:
+        if _active_profile is not None:
+            leftover, started = _active_profile
+            if time.monotonic() - started < PROFILE_STALE_AFTER:
+                return None
+            leftover.disable()
+            _active_profile = None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return None
+        _active_profile = (profiler, time.monotonic())
+    return profiler
+
+
+def stop_profile(profiler):
+    """Stops a capture without keeping it, e.g. one left running by an interrupted rerun."""
+    global _active_profile
+    profiler.disable()
+    with _lock:
+        if _active_profile is not None and _active_profile[0] is profiler:
+            _active_profile = None
+
+
+def finish_profile(profiler, label):
+    """Stops a capture and keeps its top functions by cumulative time among the recent profiles."""
+    stop_profile(profiler)
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    with _lock:
+        _profiles.appendleft({"label": label, "captured_at": time.time(),
+                              "total_s": stats.total_tt, "report": out.getvalue()})
+
+
+def recent_profiles():
+    """Returns the recent cProfile captures, newest first."""
+    with _lock:
+        return list(_profiles)
@@ -0,0 +1,51 @@
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_review_text(text: str) -> str:
+    """Normalizes a review so trivially different copies (case, spacing, unicode forms) share a cache entry."""
+    text = unicodedata.normalize("NFKC", str(text))
+    return " ".join(text.split()).casefold()
+
+
+def make_cache_key(text: str, model_version: str) -> str:
+    """Returns the cache key for a review: a SHA-256 of the model version and the normalized text."""
+    return hashlib.sha256(f"{model_version}\0{normalize_review_text(text)}".encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    """A thread-safe, size-bounded LRU mapping cache keys to {'label', 'confidence'} predictions."""
+
+    def __init__(self, max_entries=50_000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """Returns a dict of the given keys that are cached, marking them as recently used."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = value
+        return found
+
+    def put_many(self, items):
+        """Stores a dict of key -> prediction, evicting the least recently used entries beyond max_entries."""
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
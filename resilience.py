@@ -0,0 +1,144 @@
+import random
+import threading
+import time
+from collections import deque
+
+
+class LatencyTracker:
+    """A thread-safe rolling window of recent request latencies, in seconds."""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q, min_samples=1):
+        """Returns the q-quantile of the window, or None with fewer than min_samples samples."""
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class AdaptiveLimiter:
+    """
+    Caps requests in flight with an AIMD limit: each success while the limit
+    is in use raises it by 1/limit (about +1 per round of requests) up to
+    max_limit, and an overload signal (429, 5xx, timeout) multiplies it by
+    backoff, down to min_limit. Decreases are at most one per cooldown
+    seconds, so a burst of failures from requests already in flight counts once.
+    """
+
+    def __init__(self, initial=8, min_limit=1, max_limit=32, backoff=0.5, cooldown=1.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._last_decrease = float('-inf')
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self, timeout=None):
+        """Waits for a free slot. Returns False if none came free within timeout."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._in_flight < int(self._limit), timeout):
+                return False
+            self._in_flight += 1
+            return True
+
+    def try_acquire(self):
+        """Takes a free slot without waiting; returns whether one was free."""
+        return self.acquire(timeout=0)
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            # Only grow while the limit is actually being used, so an idle limit does not creep up to max_limit.
+            if self._in_flight + 1 >= int(self._limit):
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                self._condition.notify()
+
+    def on_overload(self):
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_decrease = now
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing endpoint. After failure_threshold consecutive
+    failures the circuit opens and calls fail fast for reset_timeout seconds;
+    then a single trial call is let through (half-open), which closes the
+    circuit on success or opens it again on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        """Returns whether a call may be made now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def seconds_until_retry(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+def backoff_delay(attempt, base=0.2, cap=5.0):
+    """Full-jitter exponential backoff: a random delay in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,180 @@
+"""
+A compact, columnar copy of the reviews table for analytics.
+
+The snapshot is a directory of Arrow IPC part files, each holding a range of
+review ids. Columns are stored compactly: int64 id, timestamp[us], int8
+predicted_label and dictionary-encoded review_text. refresh_snapshot appends
+a part with the reviews added since the last one. load_snapshot memory-maps
+the parts, so only the columns that are read take up memory, and the
+review_text column is left on disk unless asked for.
+
+Ids commit out of order (see history_cache), so each refresh also fetches
+rows that have committed into id gaps just below the highest exported id.
+Deleted reviews stay in the snapshot until it is rebuilt.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from database import REVIEW_PAGE_ROWS, fetch_reviews_in_ranges, fetch_reviews_since
+
+SNAPSHOT_DIR = os.environ.get("REVIEW_SNAPSHOT_DIR", os.path.join("snapshots", "reviews"))
+SNAPSHOT_MAX_PARTS = 16  # parts are merged into one once there are more than this
+SNAPSHOT_RESCAN_IDS = 100_000  # ids below the highest exported one checked again for late commits
+ANALYTICS_COLUMNS = ['timestamp', 'predicted_label']
+
+SNAPSHOT_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('timestamp', pa.timestamp('us')),
+    ('review_text', pa.dictionary(pa.int32(), pa.string())),
+    ('predicted_label', pa.int8()),
+])
+_PART_NAME = re.compile(r'^part-(\d+)-(\d+)\.arrow$')
+_snapshot_lock = threading.Lock()
+
+
+def _part_files(directory):
+    """Returns (first_id, last_id, path) for each part file, in id order."""
+    if not os.path.isdir(directory):
+        return []
+    parts = []
+    for name in os.listdir(directory):
+        match = _PART_NAME.match(name)
+        if match:
+            parts.append((int(match.group(1)), int(match.group(2)), os.path.join(directory, name)))
+    return sorted(parts)
+
+
+def _to_arrow(df):
+    """Converts a page of reviews to a single-batch table in the snapshot schema."""
+    return pa.table({
+        'id': pa.array(df['id'].to_numpy(), pa.int64()),
+        'timestamp': pa.array(pd.to_datetime(df['timestamp']), pa.timestamp('us')),
+        'review_text': pa.array(df['review_text'], pa.string()).dictionary_encode(),
+        'predicted_label': pa.array(df['predicted_label'], pa.int8(), from_pandas=True),
+    }, schema=SNAPSHOT_SCHEMA)
+
+
+def _write_part(directory, table):
+    """
+    Writes a table as one part file in id order, atomically. The dictionary
+    is unified so the file has a single batch.
+    """
+    table = table.sort_by('id').unify_dictionaries().combine_chunks()
+    first_id, last_id = table['id'][0].as_py(), table['id'][-1].as_py()
+    path = os.path.join(directory, f"part-{first_id:012d}-{last_id:012d}.arrow")
+    with pa.OSFile(path + ".tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def _read_parts(parts, columns=None):
+    tables = []
+    for _, _, path in parts:
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        tables.append(table.select(columns) if columns else table)
+    if not tables:
+        return SNAPSHOT_SCHEMA.empty_table().select(columns) if columns else SNAPSHOT_SCHEMA.empty_table()
+    return pa.concat_tables(tables)
+
+
+def _late_ranges(parts, new_ids, last_id):
+    """Returns (lows, highs) of the id gaps within SNAPSHOT_RESCAN_IDS below last_id."""
+    low = max(last_id - SNAPSHOT_RESCAN_IDS, 0)
+    recent = [part for part in parts if part[1] > low]
+    known = np.concatenate([_read_parts(recent, ['id'])['id'].to_numpy(), new_ids]) if recent else new_ids
+    bounds = np.concatenate(([low], np.unique(known[known > low]), [last_id + 1]))
+    gaps = np.flatnonzero(np.diff(bounds) > 1)
+    return (bounds[gaps] + 1).tolist(), (bounds[gaps + 1] - 1).tolist()
+
+
+def refresh_snapshot(directory=SNAPSHOT_DIR, rebuild=False, page_size=REVIEW_PAGE_ROWS):
+    """
+    Brings the snapshot up to date: reviews with an id above the highest one
+    already exported are fetched page by page (keyset pagination), along with
+    reviews that committed late into gaps below it, and written as a new part.
+    With rebuild set, the existing parts are discarded first, e.g. after
+    reviews were deleted.
+
+    Returns:
+        A dict with 'rows_added', 'rows', 'parts' and 'bytes', or None if
+        the database could not be read.
+    """
+    with _snapshot_lock:
+        os.makedirs(directory, exist_ok=True)
+        if rebuild:
+            for _, _, path in _part_files(directory):
+                os.remove(path)
+        parts = _part_files(directory)
+        last_id = max((part[1] for part in parts), default=0)
+
+        pages = []
+        while True:
+            page = fetch_reviews_since(last_id, page_size)
+            if page is None:
+                return None
+            if page.empty:
+                break
+            pages.append(_to_arrow(page))
+            last_id = int(page['id'].iloc[-1])
+            if len(page) < page_size:
+                break
+        if parts:
+            new_ids = np.concatenate([table['id'].to_numpy() for table in pages]) if pages else np.empty(0, np.int64)
+            lows, highs = _late_ranges(parts, new_ids, last_id)
+            if lows:
+                late = fetch_reviews_in_ranges(lows, highs)
+                if late is None:
+                    return None
+                if not late.empty:
+                    pages.append(_to_arrow(late))
+        rows_added = sum(len(table) for table in pages)
+        if pages:
+            _write_part(directory, pa.concat_tables(pages))
+
+        parts = _part_files(directory)
+        if len(parts) > SNAPSHOT_MAX_PARTS:
+            merged = _write_part(directory, _read_parts(parts))
+            for _, _, path in parts:
+                if path != merged:
+                    os.remove(path)
+        return dict(snapshot_info(directory), rows_added=rows_added)
+
+
+def snapshot_info(directory=SNAPSHOT_DIR):
+    """Returns the snapshot's row count, part count, size on disk and highest review id."""
+    parts = _part_files(directory)
+    return {
+        "rows": sum(_count_rows(path) for _, _, path in parts),
+        "parts": len(parts),
+        "bytes": sum(os.path.getsize(path) for _, _, path in parts),
+        "last_id": max((part[1] for part in parts), default=0),
+    }
+
+
+def _count_rows(path):
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+def load_snapshot(directory=SNAPSHOT_DIR, columns=ANALYTICS_COLUMNS):
+    """
+    Loads the snapshot as a DataFrame with compact dtypes: datetime64
+    timestamps, nullable Int8 labels and, if requested, review_text as an
+    Arrow-backed string column. The part files are memory-mapped, so columns
+    that are not requested are never read.
+    """
+    table = _read_parts(_part_files(directory), list(columns))
+    if 'review_text' in table.column_names:
+        # Most reviews are unique, so a pandas Categorical would cost more than plain Arrow strings.
+        index = table.column_names.index('review_text')
+        table = table.set_column(index, 'review_text', table['review_text'].cast(pa.string()))
+    return table.to_pandas(types_mapper={pa.int8(): pd.Int8Dtype(), pa.string(): pd.StringDtype("pyarrow")}.get)
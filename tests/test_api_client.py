@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import api_client
+from benchmarks.stub_server import start_stub_server
+
+
+class StubServerTestCase(unittest.TestCase):
+    """Points api_client at a local stub server with fresh tail-latency controls."""
+
+    def setUp(self):
+        self.server, url = start_stub_server(latency=0)
+        self._api_url = api_client.API_URL
+        api_client.API_URL = url
+        api_client.reset_api_controls()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        api_client.API_URL = self._api_url
+        api_client.reset_api_controls()
+
+
+class HedgedPostTest(StubServerTestCase):
+    def test_winning_hedge_keeps_the_primary_slot_until_it_finishes(self):
+        for i in range(20):
+            api_client._post({"text": f"warm up {i}"}, "single")
+        for _ in range(200):
+            api_client._latency["single"].record(0.1)  # hedge after 100 ms
+
+        # The primary request sleeps 0.5 s; requests arriving after 30 ms (the hedge) are answered at once.
+        self.server.latency = 0.5
+        threading.Timer(0.03, setattr, (self.server, "latency", 0)).start()
+        start = time.perf_counter()
+        response = api_client._post({"text": "slow"}, "single")
+        self.assertTrue(response.ok)
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertEqual(api_client.get_api_stats()["hedge_wins"], 1)
+        self.assertEqual(api_client._limiter.in_flight, 1)  # the primary is still running
+
+        deadline = time.monotonic() + 2
+        while api_client._limiter.in_flight and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(api_client._limiter.in_flight, 0)
+
+    def test_unhedged_requests_release_their_slot(self):
+        for i in range(5):
+            api_client._post({"text": f"review {i}"}, "single")
+        self.assertEqual(api_client._limiter.in_flight, 0)
+        self.assertEqual(api_client.get_api_stats().get("hedges", 0), 0)
+
+
+class MakeChunksTest(unittest.TestCase):
+    def test_chunks_are_bounded_by_count_and_bytes(self):
+        items = list(enumerate(["a" * 10] * 7))
+        chunks = list(api_client._make_chunks(items, chunk_size=3, max_payload_bytes=1000))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        # Each item is 13 bytes of JSON ("aaaaaaaaaa" plus a comma), so two fit in 30 bytes.
+        chunks = list(api_client._make_chunks(items, chunk_size=32, max_payload_bytes=30))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 2, 1])
+        self.assertEqual([i for chunk in chunks for i, _ in chunk], list(range(7)))
+
+    def test_item_over_the_byte_cap_goes_alone(self):
+        items = [(0, "short"), (1, "x" * 500), (2, "short")]
+        chunks = list(api_client._make_chunks(items, chunk_size=32, max_payload_bytes=100))
+        self.assertEqual([[i for i, _ in chunk] for chunk in chunks], [[0], [1], [2]])
+
+
+class BatchRequestTest(StubServerTestCase):
+    def test_mixed_good_and_bad_items(self):
+        results = api_client._request_prediction_chunk(["great stay", 42, "awful room"])
+        self.assertEqual(set(results[0]), {"label", "confidence"})
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIn("text must be a string", str(results[1]))
+        self.assertEqual(set(results[2]), {"label", "confidence"})
+        self.assertIsNone(api_client._batch_rejected_at)
+
+    def test_oversized_batch_falls_back_without_disabling_batches(self):
+        self.server.max_body_bytes = 200
+        chunk = [(0, "x" * 150), (1, "y" * 150)]
+        with self.assertRaises(api_client._BatchRejected):
+            api_client._request_prediction_chunk([text for _, text in chunk])
+        self.assertIsNone(api_client._batch_rejected_at)  # 413 is about this chunk only
+
+        outcomes = api_client._score_chunk(chunk)
+        self.assertTrue(all(isinstance(outcome, dict) for _, outcome in outcomes))
+        self.server.max_body_bytes = None
+        served = self.server.requests_served
+        api_client._score_chunk([(0, "short"), (1, "texts")])
+        self.assertEqual(self.server.requests_served - served, 1)
+
+    def test_rejected_batches_fall_back_and_are_probed_again(self):
+        self.server.batch = False  # {"texts": [...]} gets a 422
+        chunk = [(0, "clean room"), (1, "rude staff"), (2, "nice view")]
+        served = self.server.requests_served
+        outcomes = api_client._score_chunk(chunk)
+        self.assertTrue(all(isinstance(outcome, dict) for _, outcome in outcomes))
+        self.assertEqual(self.server.requests_served - served, 4)  # the batch, then one request per review
+        self.assertIsNotNone(api_client._batch_rejected_at)
+
+        served = self.server.requests_served
+        api_client._score_chunk(chunk)
+        self.assertEqual(self.server.requests_served - served, 3)  # no batch while the rejection is recent
+
+        self.server.batch = True
+        with mock.patch.object(api_client, "BATCH_REPROBE_AFTER", 0):
+            served = self.server.requests_served
+            outcomes = api_client._score_chunk(chunk)
+        self.assertEqual(self.server.requests_served - served, 1)
+        self.assertTrue(all(isinstance(outcome, dict) for _, outcome in outcomes))
+        self.assertIsNone(api_client._batch_rejected_at)
+
+
+if __name__ == "__main__":
+    unittest.main()
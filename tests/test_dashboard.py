@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from dashboard import bucket_trend_counts, downsample_trend_counts, lttb_indices
+
+
+def _daily(dates, labels, counts):
+    return pd.DataFrame({'date': pd.to_datetime(dates), 'predicted_label': labels, 'count': counts})
+
+
+class BucketTrendCountsTest(unittest.TestCase):
+    def test_weeks_start_on_monday(self):
+        dates = pd.date_range("2023-12-28", "2024-01-16")  # Thursday to Tuesday, across a year end
+        daily = _daily(dates, [1] * len(dates), [1] * len(dates))
+        weekly = bucket_trend_counts(daily, 'week')
+        self.assertTrue((pd.to_datetime(weekly['date']).dt.dayofweek == 0).all())
+        self.assertEqual(dict(zip(pd.to_datetime(weekly['date']).dt.strftime('%Y-%m-%d'), weekly['count'])),
+                         {"2023-12-25": 4, "2024-01-01": 7, "2024-01-08": 7, "2024-01-15": 2})
+
+    def test_sunday_belongs_to_the_week_before(self):
+        weekly = bucket_trend_counts(_daily(["2024-01-07", "2024-01-08"], [0, 0], [2, 3]), 'week')
+        self.assertEqual(pd.to_datetime(weekly['date']).dt.strftime('%Y-%m-%d').tolist(), ["2024-01-01", "2024-01-08"])
+
+    def test_months_are_truncated_per_label(self):
+        daily = _daily(["2024-01-31", "2024-02-01", "2024-02-29", "2024-02-29"], [1, 1, 1, 0], [5, 2, 3, 4])
+        monthly = bucket_trend_counts(daily, 'month')
+        rows = {(date.strftime('%Y-%m-%d'), label): count
+                for date, label, count in zip(pd.to_datetime(monthly['date']), monthly['predicted_label'], monthly['count'])}
+        self.assertEqual(rows, {("2024-01-01", 1): 5, ("2024-02-01", 1): 5, ("2024-02-01", 0): 4})
+
+
+class LttbTest(unittest.TestCase):
+    def _check(self, indices, n, threshold):
+        self.assertLessEqual(len(indices), threshold)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], n - 1)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_keeps_ends_and_returns_increasing_indices(self):
+        rng = np.random.default_rng(0)
+        y = rng.normal(size=1000).cumsum()
+        indices = lttb_indices(np.arange(1000), y, 50)
+        self.assertEqual(len(indices), 50)
+        self._check(indices, 1000, 50)
+
+    def test_one_point_over_the_threshold(self):
+        for threshold in range(3, 30):
+            n = threshold + 1
+            indices = lttb_indices(np.arange(n), np.sin(np.arange(n)), threshold)
+            self._check(indices, n, threshold)
+
+    def test_short_series_are_kept_whole(self):
+        self.assertEqual(lttb_indices(np.arange(5), np.arange(5), 5).tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(lttb_indices(np.arange(5), np.arange(5), 2).tolist(), [0, 1, 2, 3, 4])
+
+    def test_keeps_a_spike(self):
+        y = np.zeros(500)
+        y[321] = 100
+        self.assertIn(321, lttb_indices(np.arange(500), y, 20).tolist())
+
+    def test_downsamples_each_label_separately(self):
+        dates = pd.date_range("2020-01-01", periods=400)
+        daily = pd.concat([_daily(dates, [label] * 400, np.arange(400) % 17) for label in (0, 1)], ignore_index=True)
+        sampled = downsample_trend_counts(daily, max_points=40)
+        self.assertEqual(sampled.groupby('predicted_label').size().to_dict(), {0: 40, 1: 40})
+        for _, line in sampled.groupby('predicted_label'):
+            self.assertEqual((line['date'].min(), line['date'].max()), (dates[0], dates[-1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
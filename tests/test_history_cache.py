@@ -0,0 +1,69 @@
+import unittest
+
+import pandas as pd
+
+from history_cache import ReviewHistoryCache
+
+
+class FakeReviews:
+    """An in-memory reviews table; rows are only visible to reads once committed."""
+
+    def __init__(self):
+        self.committed = {}
+
+    def commit(self, *ids):
+        for review_id in ids:
+            self.committed[review_id] = (pd.Timestamp("2024-01-01") + pd.Timedelta(minutes=review_id),
+                                         f"review {review_id}", review_id % 2)
+
+    def _frame(self, ids):
+        return pd.DataFrame([(i, *self.committed[i]) for i in ids],
+                            columns=['id', 'timestamp', 'review_text', 'predicted_label'])
+
+    def fetch_page(self, last_id, page_size):
+        return self._frame(sorted(i for i in self.committed if i > last_id)[:page_size])
+
+    def fetch_ranges(self, lows, highs):
+        return self._frame(sorted(i for i in self.committed if any(lo <= i <= hi for lo, hi in zip(lows, highs))))
+
+
+class ReviewHistoryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.table = FakeReviews()
+        self.cache = ReviewHistoryCache(fetch_page=self.table.fetch_page, fetch_ranges=self.table.fetch_ranges,
+                                        page_size=3, refresh_interval=0, rescan_ids=100)
+
+    def test_appends_new_rows_newest_first(self):
+        self.table.commit(1, 2, 3, 4)
+        self.assertEqual(self.cache.refresh()['review_text'].tolist(), [f"review {i}" for i in (4, 3, 2, 1)])
+        self.table.commit(5)
+        self.assertEqual(self.cache.refresh()['review_text'].iloc[0], "review 5")
+        self.assertEqual(self.cache.last_id, 5)
+
+    def test_row_committed_below_the_cached_maximum_is_picked_up(self):
+        # An upload took ids 3-5 but commits after a single review with id 6.
+        self.table.commit(1, 2, 6)
+        self.assertEqual(len(self.cache.refresh()), 3)
+        self.assertEqual(self.cache.last_id, 6)
+        self.table.commit(3, 4, 5)
+        rows = self.cache.refresh()
+        self.assertEqual(rows['review_text'].tolist(), [f"review {i}" for i in (6, 5, 4, 3, 2, 1)])
+        self.assertEqual(self.cache.stats()["late_rows"], 3)
+        # Nothing is fetched twice.
+        self.assertEqual(len(self.cache.refresh()), 6)
+
+    def test_gaps_beyond_the_rescan_window_are_left_to_reload(self):
+        self.cache.rescan_ids = 2
+        self.table.commit(1, 5, 6)
+        self.cache.refresh()
+        self.table.commit(2)
+        self.assertEqual(len(self.cache.refresh()), 3)
+        self.assertEqual(len(self.cache.reload()), 4)
+
+    def test_failed_fetch_returns_none_before_first_load(self):
+        cache = ReviewHistoryCache(fetch_page=lambda last_id, page_size: None, fetch_ranges=self.table.fetch_ranges)
+        self.assertIsNone(cache.refresh())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+
+import metrics
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_mixed_label_value_types_render(self):
+        metrics.increment("api_responses", status=200)
+        metrics.increment("api_responses", status="connection_error")
+        metrics.increment("api_responses", status=200)
+        text = metrics.render_prometheus()
+        self.assertIn('sentiment_app_api_responses_total{status="200"} 2', text)
+        self.assertIn('sentiment_app_api_responses_total{status="connection_error"} 1', text)
+        self.assertEqual(text.count("# TYPE sentiment_app_api_responses_total counter"), 1)
+
+    def test_stage_histogram_is_cumulative(self):
+        metrics.observe("db.fetch", 0.003, rows=10)
+        metrics.observe("db.fetch", 2.0, rows=5, error=True)
+        text = metrics.render_prometheus()
+        self.assertIn('sentiment_app_stage_duration_seconds_bucket{stage="db.fetch",le="0.005"} 1', text)
+        self.assertIn('sentiment_app_stage_duration_seconds_bucket{stage="db.fetch",le="+Inf"} 2', text)
+        self.assertIn('sentiment_app_stage_duration_seconds_count{stage="db.fetch"} 2', text)
+        self.assertIn('sentiment_app_stage_rows_total{stage="db.fetch"} 15', text)
+        self.assertIn('sentiment_app_stage_errors_total{stage="db.fetch"} 1', text)
+
+    def test_label_values_are_escaped(self):
+        metrics.increment("odd", path='a"b\\c\nd')
+        self.assertIn('sentiment_app_odd_total{path="a\\"b\\\\c\\nd"} 1', metrics.render_prometheus())
+
+    def test_hit_rates(self):
+        metrics.increment("prediction_cache_lookups", 3, tier="memory", result="hit")
+        metrics.increment("prediction_cache_lookups", 1, tier="memory", result="miss")
+        metrics.increment("prediction_cache_lookups", 0, tier="database", result="hit")
+        metrics.increment("prediction_cache_lookups", 1, tier="database", result="miss")
+        metrics.increment("aspect_lookups", 5, tier="aspect_index", result="hit")
+        self.assertEqual(metrics.hit_rates("prediction_cache_lookups"), {"memory": (3, 4), "database": (0, 1)})
+
+    def test_timed_counts_errors_and_rows(self):
+        with self.assertRaises(ValueError):
+            with metrics.timed("work") as stage:
+                stage.rows = 7
+                raise ValueError
+        (entry,) = metrics.snapshot()["stages"]
+        self.assertEqual((entry["stage"], entry["count"], entry["errors"], entry["rows"]), ("work", 1, 1, 7))
+
+
+class ProfileTest(unittest.TestCase):
+    def tearDown(self):
+        if metrics._active_profile is not None:
+            metrics.stop_profile(metrics._active_profile[0])
+
+    def test_one_capture_at_a_time(self):
+        profiler = metrics.start_profile()
+        self.assertIsNotNone(profiler)
+        self.assertIsNone(metrics.start_profile())
+        metrics.finish_profile(profiler, "first")
+        self.assertEqual(metrics.recent_profiles()[0]["label"], "first")
+        second = metrics.start_profile()
+        self.assertIsNotNone(second)
+        metrics.stop_profile(second)
+
+    def test_stale_capture_is_replaced(self):
+        leftover = metrics.start_profile()
+        with mock.patch.object(metrics, "PROFILE_STALE_AFTER", 0):
+            profiler = metrics.start_profile()
+        self.assertIsNotNone(profiler)
+        self.assertIsNot(profiler, leftover)
+        metrics.stop_profile(profiler)
+        self.assertIsNone(metrics._active_profile)
+
+    def test_profiler_hook_in_use(self):
+        busy = mock.Mock()
+        busy.enable.side_effect = ValueError("Another profiling tool is already active")
+        with mock.patch.object(metrics.cProfile, "Profile", return_value=busy):
+            self.assertIsNone(metrics.start_profile())
+        self.assertIsNone(metrics._active_profile)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import time
+import unittest
+
+from resilience import AdaptiveLimiter, CircuitBreaker, LatencyTracker, backoff_delay
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_grows_only_while_the_limit_is_in_use(self):
+        limiter = AdaptiveLimiter(initial=2, max_limit=4)
+        limiter.on_success()
+        self.assertEqual(limiter.limit, 2)  # idle: nothing in flight
+        self.assertTrue(limiter.acquire(timeout=0))
+        self.assertTrue(limiter.acquire(timeout=0))
+        for _ in range(3):
+            limiter.on_success()
+        self.assertEqual(limiter.limit, 3)  # 2 -> 2.5 -> 2.9 -> 3.24
+        for _ in range(50):
+            limiter.on_success()
+        self.assertEqual(limiter.limit, 4)
+
+    def test_full_limit_blocks_until_release(self):
+        limiter = AdaptiveLimiter(initial=1)
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+        self.assertFalse(limiter.acquire(timeout=0.01))
+        limiter.release()
+        self.assertTrue(limiter.try_acquire())
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_backoff_once_per_cooldown(self):
+        limiter = AdaptiveLimiter(initial=8, cooldown=60)
+        limiter.on_overload()
+        limiter.on_overload()
+        self.assertEqual(limiter.limit, 4)
+
+    def test_backoff_stops_at_min_limit(self):
+        limiter = AdaptiveLimiter(initial=8, min_limit=2, cooldown=0)
+        for _ in range(5):
+            limiter.on_overload()
+        self.assertEqual(limiter.limit, 2)
+
+    def test_backoff_again_after_cooldown(self):
+        limiter = AdaptiveLimiter(initial=8, cooldown=0.05)
+        limiter.on_overload()
+        time.sleep(0.06)
+        limiter.on_overload()
+        self.assertEqual(limiter.limit, 2)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+
+    def _open(self):
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+        time.sleep(0.06)
+        self.assertEqual(self.breaker.state, "half-open")
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_single_trial_then_close(self):
+        self._open()
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())  # only one trial call at a time
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        self._open()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()  # one failure is enough while half-open
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+        self.assertGreater(self.breaker.seconds_until_retry(), 0)
+
+
+class LatencyTrackerTest(unittest.TestCase):
+    def test_quantiles(self):
+        tracker = LatencyTracker()
+        for ms in range(100, 0, -1):
+            tracker.record(ms / 1000)
+        self.assertAlmostEqual(tracker.quantile(0.5), 0.051)
+        self.assertAlmostEqual(tracker.quantile(0.95), 0.096)
+        self.assertAlmostEqual(tracker.quantile(1.0), 0.100)
+        self.assertAlmostEqual(tracker.quantile(0.0), 0.001)
+
+    def test_min_samples(self):
+        tracker = LatencyTracker()
+        self.assertIsNone(tracker.quantile(0.5))
+        tracker.record(0.2)
+        self.assertIsNone(tracker.quantile(0.5, min_samples=2))
+        self.assertEqual(tracker.quantile(0.5, min_samples=1), 0.2)
+
+    def test_window_keeps_recent_samples(self):
+        tracker = LatencyTracker(window=3)
+        for seconds in (9.0, 1.0, 2.0, 3.0):
+            tracker.record(seconds)
+        self.assertEqual(len(tracker), 3)
+        self.assertEqual(tracker.quantile(1.0), 3.0)
+
+
+class BackoffDelayTest(unittest.TestCase):
+    def test_delay_is_capped(self):
+        for attempt in range(10):
+            self.assertLessEqual(backoff_delay(attempt, base=0.2, cap=1.0), min(1.0, 0.2 * 2 ** attempt))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import re
+import ssl
+import threading
+from collections import Counter
+from functools import lru_cache
+
+# NLTK is imported on first use rather than at module import, so app startup
+# and modules that only need these helpers occasionally stay fast.
+_NLTK_RESOURCES = {
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+}
+_nltk_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _ensure_nltk_data():
+    """Checks for the NLTK corpora once per process and downloads any that are missing."""
+    import nltk
+
+    with _nltk_lock:
+        missing = []
+        for package, path in _NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                missing.append(package)
+        if missing:
+            # Some hosts lack the CA bundle nltk.download needs; relax verification for the download only.
+            default_context = ssl._create_default_https_context
+            ssl._create_default_https_context = ssl._create_unverified_context
+            try:
+                for package in missing:
+                    nltk.download(package, quiet=True)
+            finally:
+                ssl._create_default_https_context = default_context
+    return nltk
+
+
+_NON_LETTERS = re.compile(r'[^a-zA-Z\s]')
+
+
+@lru_cache(maxsize=1)
+def _stop_words():
+    """The English stopword set, loaded once per process."""
+    _ensure_nltk_data()
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('english'))
+
+
+@lru_cache(maxsize=1)
+def _lemmatizer():
+    """The WordNet lemmatizer, loaded once per process."""
+    _ensure_nltk_data()
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer()
+
+
+@lru_cache(maxsize=200_000)
+def lemmatize(word):
+    """Lemmatizes a single lower-case word. Cached, since review vocabularies repeat heavily."""
+    return _lemmatizer().lemmatize(word)
+
+
+def _tokens(text):
+    # Letters only, lower-cased; with punctuation and digits removed, splitting on whitespace tokenizes the text.
+    return _NON_LETTERS.sub('', str(text)).lower().split()
+
+
+def preprocess_for_word_count(text):
+    """Lower-cases, strips non-letters, removes stopwords and lemmatizes a review."""
+    stop_words = _stop_words()
+    return " ".join(lemmatize(word) for word in _tokens(text) if word not in stop_words and len(word) > 1)
+
+
+def review_terms(text):
+    """Returns the set of distinct lemmatized, non-stopword terms in a review."""
+    stop_words = _stop_words()
+    return {lemmatize(word) for word in _tokens(text) if word not in stop_words and len(word) > 1}
+
+
+def count_terms_by_label(texts, labels):
+    """
+    Counts, for each (term, predicted_label) pair, how many of the given
+    reviews contain the term. Each review counts once per term.
+
+    Returns:
+        A Counter keyed by (term, label).
+    """
+    counts = Counter()
+    for text, label in zip(texts, labels):
+        if not isinstance(text, str) or label is None or label != label:  # label != label skips NaN
+            continue
+        label = int(label)
+        counts.update((term, label) for term in review_terms(text))
+    return counts
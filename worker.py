@@ -0,0 +1,151 @@
+"""
+Background worker for queued bulk uploads. The Bulk Upload tab stores each
+CSV as a row in ingest_jobs; workers claim jobs one at a time, score and
+save the reviews with ingest_csv and record progress as they go, so uploads
+survive the browser tab closing. A job whose worker dies is picked up again
+by another worker and resumes from the upload's last committed chunk.
+
+Reads the database and model settings like the app (DATABASE_URL or
+.streamlit/secrets.toml).
+
+    python worker.py                 # one worker, polling every 2 seconds
+    python worker.py --workers 4     # four worker processes
+    python worker.py --once          # process the queue, then exit
+    python worker.py --metrics-port 9100   # serve /metrics (port + index per process)
+
+To try it locally without the deployed model, run the stub model server
+and point the worker at it:
+
+    python -m benchmarks.stub_server --port 8000
+    python worker.py --api-url http://127.0.0.1:8000/predict
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+import api_client
+import database
+import metrics
+from ingest import ingest_csv
+from resilience import backoff_delay
+
+POLL_INTERVAL = 2  # seconds between looks at an empty queue
+HEARTBEAT_INTERVAL = 5  # seconds between progress updates while a job runs
+SETUP_ATTEMPTS = 6  # tries at database setup on start, with backoff, before giving up
+
+
+class JobCancelled(Exception):
+    """Raised from the progress callback when the job was cancelled or handed to another worker."""
+
+
+def _progress_reporter(job_id, worker_id):
+    """Returns a progress callback that records progress at most every HEARTBEAT_INTERVAL seconds."""
+    last_beat = time.monotonic()
+
+    def report(rows_done, total_rows):
+        nonlocal last_beat
+        now = time.monotonic()
+        if now - last_beat < HEARTBEAT_INTERVAL and rows_done < total_rows:
+            return
+        last_beat = now
+        if database.update_ingest_job_progress(job_id, worker_id, rows_done) is False:
+            raise JobCancelled(job_id)
+
+    return report
+
+
+def process_job(job, worker_id):
+    """Runs one claimed job to completion and records the outcome. Returns the final status."""
+    try:
+        with database.open_ingest_job_csv(job["id"], job["csv_bytes"]) as csv_file:
+            summary = ingest_csv(
+                csv_file,
+                job["file_key"],
+                file_name=job["file_name"],
+                restart=job["restart"] and job["attempts"] == 1,  # a retried job resumes from its checkpoint
+                progress_callback=_progress_reporter(job["id"], worker_id),
+                total_rows=job["total_rows"],
+            )
+    except JobCancelled:
+        return "cancelled"
+    except Exception as e:
+        status = "queued" if job["attempts"] < database.JOB_MAX_ATTEMPTS else "failed"
+        database.finish_ingest_job(job["id"], worker_id, status, error=f"{type(e).__name__}: {e}")
+        return status
+
+    summary = dict(summary, label_counts=dict(summary["label_counts"]), cache=dict(summary["cache"]))
+    if summary["completed"]:
+        status, error = "done", None
+    else:
+        status = "queued" if job["attempts"] < database.JOB_MAX_ATTEMPTS else "failed"
+        error = f"Stopped after saving {summary['rows_saved']} reviews."
+    database.update_ingest_job_progress(job["id"], worker_id, summary["resumed_from"] + summary["rows_read"])
+    database.finish_ingest_job(job["id"], worker_id, status, summary=summary, error=error)
+    return status
+
+
+def run_worker(worker_id, poll_interval=POLL_INTERVAL, once=False):
+    """Claims and processes jobs until interrupted, or until the queue is empty if once is set."""
+    # The database may still be starting, e.g. when launched alongside it.
+    attempt = 0
+    while not database.ensure_database_ready():
+        attempt += 1
+        if attempt >= SETUP_ATTEMPTS:
+            print(f"[{worker_id}] database setup failed", file=sys.stderr)
+            return 1
+        delay = backoff_delay(attempt, base=1.0, cap=30.0)
+        print(f"[{worker_id}] database setup failed; retrying in {delay:.1f}s", file=sys.stderr, flush=True)
+        time.sleep(delay)
+    while True:
+        job = database.claim_ingest_job(worker_id)
+        if job is None:
+            if once:
+                return 0
+            time.sleep(poll_interval)
+            continue
+        print(f"[{worker_id}] job {job['id']} ({job['file_name']}, attempt {job['attempts']}) started", flush=True)
+        start = time.perf_counter()
+        status = process_job(job, worker_id)
+        print(f"[{worker_id}] job {job['id']} {status} in {time.perf_counter() - start:.1f}s", flush=True)
+
+
+def _worker_main(index, args):
+    if args.api_url:
+        api_client.API_URL = args.api_url
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    if args.metrics_port:
+        print(f"[{worker_id}] metrics at {metrics.start_metrics_server(args.metrics_port + index)}", flush=True)
+    try:
+        return run_worker(worker_id, args.poll_interval, args.once)
+    except KeyboardInterrupt:
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process queued bulk uploads.")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--once", action="store_true", help="exit once the queue is empty")
+    parser.add_argument("--api-url", help="model endpoint to use instead of api_client.API_URL")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics from this port (plus the worker index)")
+    args = parser.parse_args(argv)
+
+    if args.workers <= 1:
+        return _worker_main(0, args)
+    processes = [multiprocessing.Process(target=_worker_main, args=(i, args)) for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())